@@ -259,7 +259,6 @@ document.getElementById('encryptBtn').addEventListener('click', async () => {
 
         if (data.success) {
             const meta = data.metadata;
-            const ai = data.ai_analysis;
 
             // Build download URL and inject button
             const downloadUrl = `/api/download-encrypted?session_id=${encodeURIComponent(sessionId)}`;
@@ -300,22 +299,12 @@ document.getElementById('encryptBtn').addEventListener('click', async () => {
 
 
 
+            const ai = data.ai_analysis || (data.ai_pending
+                ? await pollJob(`/api/anomaly-result?session_id=${encodeURIComponent(sessionId)}`).then(r => r.ai_analysis).catch(() => null)
+                : null);
+
             if (ai) {
-                const statusIcon = ai.is_anomaly ? '🔴' : '🟢';
-
-                aiAnalysisDiv.classList.remove('hidden');
-                aiAnalysisDiv.innerHTML = `
-                    <h3>${statusIcon} AI Security Analysis</h3>
-                    <p><strong>Status:</strong> ${ai.is_anomaly ? 'Anomaly Detected' : 'Normal Operation'}</p>
-                    <p><strong>Risk Level:</strong> <span style="color: ${getRiskColor(ai.risk_level)}">${ai.risk_level}</span></p>
-                    <p><strong>Confidence:</strong> ${ai.confidence.toFixed(1)}%</p>
-                    ${ai.is_anomaly ? `
-                        <div style="margin-top: 15px; padding: 15px; background: rgba(248, 113, 113, 0.1); border-left: 3px solid var(--danger); border-radius: 8px;">
-                            <strong>⚠️ Recommendations:</strong>
-                            ${ai.recommendations.map(rec => `<br>• ${rec}`).join('')}
-                        </div>
-                    ` : ''}
-                `;
+                renderAiAnalysis(aiAnalysisDiv, ai);
             }
         } else {
             throw new Error(data.error);
@@ -330,6 +319,36 @@ document.getElementById('encryptBtn').addEventListener('click', async () => {
     }
 });
 
+// Poll a background-job endpoint until it stops reporting "pending"
+async function pollJob(url, intervalMs = 300, maxTries = 200) {
+    for (let i = 0; i < maxTries; i++) {
+        const response = await fetch(url);
+        const data = await response.json();
+        if (!data.success) throw new Error(data.error);
+        if (data.status !== 'pending') return data;
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Timed out waiting for result');
+}
+
+function renderAiAnalysis(aiAnalysisDiv, ai) {
+    const statusIcon = ai.is_anomaly ? '🔴' : '🟢';
+
+    aiAnalysisDiv.classList.remove('hidden');
+    aiAnalysisDiv.innerHTML = `
+        <h3>${statusIcon} AI Security Analysis</h3>
+        <p><strong>Status:</strong> ${ai.is_anomaly ? 'Anomaly Detected' : 'Normal Operation'}</p>
+        <p><strong>Risk Level:</strong> <span style="color: ${getRiskColor(ai.risk_level)}">${ai.risk_level}</span></p>
+        <p><strong>Confidence:</strong> ${ai.confidence.toFixed(1)}%</p>
+        ${ai.is_anomaly ? `
+            <div style="margin-top: 15px; padding: 15px; background: rgba(248, 113, 113, 0.1); border-left: 3px solid var(--danger); border-radius: 8px;">
+                <strong>⚠️ Recommendations:</strong>
+                ${ai.recommendations.map(rec => `<br>• ${rec}`).join('')}
+            </div>
+        ` : ''}
+    `;
+}
+
 function getRiskColor(level) {
     const colors = {
         'CRITICAL': '#f87171',
@@ -546,7 +565,12 @@ async function sendMessage() {
             body: JSON.stringify({ question })
         });
 
-        const data = await response.json();
+        let data = await response.json();
+
+        // Uncached questions are answered in the background
+        if (data.success && data.answer === null && data.job_id) {
+            data = await pollJob(`/api/chat-result?job_id=${encodeURIComponent(data.job_id)}`);
+        }
 
         document.getElementById('typing').remove();
 
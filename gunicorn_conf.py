@@ -0,0 +1,44 @@
+"""
+Gunicorn configuration for QBits
+Run from the repository root: gunicorn -c gunicorn_conf.py
+"""
+
+import os
+
+# One BLAS/OpenMP thread per worker thread - joblib/numpy would oversubscribe otherwise
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+wsgi_app = 'wsgi:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+worker_class = 'gthread'
+# Sessions and background jobs live in process memory unless REDIS_URL points
+# the app at a shared Redis, so only scale out to one worker per CPU with it
+workers = int(os.environ.get('WEB_CONCURRENCY',
+                             (os.cpu_count() or 1) if os.environ.get('REDIS_URL') else 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 120
+
+# Load the app (and train the models) once in the master, share it copy-on-write.
+# Fork-unsafe state (threads, onnxruntime sessions) is created per worker.
+preload_app = True
+
+# Let send_file downloads go through os.sendfile
+sendfile = True
+
+
+def on_starting(server):
+    if workers > 1 and not os.environ.get('REDIS_URL'):
+        server.log.warning(
+            "⚠️  %d workers without REDIS_URL: sessions and background jobs are "
+            "per worker, so requests routed to another worker will fail. "
+            "Set REDIS_URL or WEB_CONCURRENCY=1.", workers
+        )
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork, so each worker starts its own
+    from app import start_background_workers
+    start_background_workers()
@@ -6,16 +6,38 @@ Uses ML to detect anomalies and predict threats
 
 import numpy as np
 from sklearn.ensemble import IsolationForest
+from sklearn.linear_model import Ridge
 from sklearn.preprocessing import StandardScaler
 import joblib
 import json
+import os
 from datetime import datetime
 import hashlib
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+try:
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
 
 class AISecurityMonitor:
     """ML-based security monitoring and threat detection"""
     
-    def __init__(self):
+    HISTORY_SIZE = 10_000
+    N_FEATURES = 5
+    
+    # Concurrent detect_anomaly calls are coalesced into one scoring pass
+    BATCH_SIZE = 32
+    BATCH_WINDOW = 0.002  # seconds
+    
+    def __init__(self, bootstrap=True):
         self.anomaly_detector = IsolationForest(
             contamination=0.1,
             random_state=42,
@@ -23,18 +45,44 @@ class AISecurityMonitor:
         )
         self.scaler = StandardScaler()
         self.is_trained = False
-        self.encryption_history = []
+        # Bounded history plus running counters so the dashboard is O(1)
+        self.encryption_history = deque(maxlen=self.HISTORY_SIZE)
+        self._total = 0
+        self._anomalies = 0
+        self._history_lock = threading.Lock()  # detect_anomaly runs on many threads
+        self._onnx_model = None  # serialized graph; sessions are built per process
+        self._onnx_session = None
+        self._onnx_pid = None
+        self._batch_queue = queue.Queue()
+        self._batch_worker = None
+        self._batch_lock = threading.Lock()
+        
+        # Train on synthetic baseline data up front, never inside a request
+        if bootstrap:
+            self._bootstrap_training()
         
     def extract_features(self, encryption_data):
         """Extract features from encryption operation"""
-        features = [
+        return np.array([[
             encryption_data.get('file_size', 0),
             encryption_data.get('encryption_time', 0) * 1000,  # Convert to ms
             len(encryption_data.get('algorithm', '')),
             encryption_data.get('key_size', 0),
             encryption_data.get('timestamp', 0) % 86400,  # Time of day in seconds
-        ]
-        return np.array(features).reshape(1, -1)
+        ]], dtype=np.float64)
+    
+    def _extract_features_batch(self, operations):
+        """Extract features for many operations into one (n, 5) matrix"""
+        n = len(operations)
+        X = np.empty((n, self.N_FEATURES), dtype=np.float64)
+        X[:, 0] = np.fromiter((op.get('file_size', 0) for op in operations), np.float64, n)
+        X[:, 1] = np.fromiter((op.get('encryption_time', 0) for op in operations), np.float64, n)
+        X[:, 1] *= 1000  # Convert to ms
+        X[:, 2] = np.fromiter((len(op.get('algorithm', '')) for op in operations), np.float64, n)
+        X[:, 3] = np.fromiter((op.get('key_size', 0) for op in operations), np.float64, n)
+        X[:, 4] = np.fromiter((op.get('timestamp', 0) for op in operations), np.float64, n)
+        X[:, 4] %= 86400  # Time of day in seconds
+        return X
     
     def train_baseline(self, normal_operations):
         """Train on normal encryption operations"""
@@ -43,39 +91,45 @@ class AISecurityMonitor:
             return False
         
         # Extract features from all operations
-        features = []
-        for op in normal_operations:
-            feat = self.extract_features(op)
-            features.append(feat.flatten())
-        
-        X = np.array(features)
+        X = self._extract_features_batch(normal_operations)
+        self._fit(X)
         
+        print(f"✅ AI model trained on {len(normal_operations)} normal operations")
+        return True
+    
+    def _fit(self, X):
+        """Fit scaler and anomaly detector on a raw feature matrix"""
         # Scale features
         X_scaled = self.scaler.fit_transform(X)
         
+        # Cache the scaler as a fused affine for the per-request path
+        self._mean = self.scaler.mean_.astype(np.float32)
+        self._inv_scale = (1.0 / self.scaler.scale_).astype(np.float32)
+        
         # Train anomaly detector
         self.anomaly_detector.fit(X_scaled)
+        self._offset = float(self.anomaly_detector.offset_)
+        self._compile_scoring_kernel(X.shape[1])
+        
+        # The ONNX graph keeps its own float32 copy of the trees, so the
+        # sklearn estimators are dead weight once it's built (refit restores them)
+        if self._onnx_model is not None:
+            self.anomaly_detector.estimators_ = []
+            self.anomaly_detector.estimators_features_ = []
         self.is_trained = True
-        
-        print(f"✅ AI model trained on {len(normal_operations)} normal operations")
-        return True
     
     def detect_anomaly(self, encryption_data):
         """Detect if operation is anomalous"""
         if not self.is_trained:
-            # Generate synthetic training data if not trained
-            self._bootstrap_training()
+            raise RuntimeError("Anomaly detector is not trained - call train_baseline() first")
         
         features = self.extract_features(encryption_data)
-        features_scaled = self.scaler.transform(features)
-        
-        # Predict (-1 for anomaly, 1 for normal)
-        prediction = self.anomaly_detector.predict(features_scaled)[0]
         
-        # Get anomaly score (lower is more anomalous)
-        score = self.anomaly_detector.score_samples(features_scaled)[0]
+        # Get anomaly score (lower is more anomalous). predict() is just
+        # score_samples() compared against offset_, so one pass is enough.
+        score = self._score_batched(features)
         
-        is_anomaly = prediction == -1
+        is_anomaly = score < self._offset
         confidence = abs(score) * 100  # Convert to percentage
         
         result = {
@@ -85,40 +139,132 @@ class AISecurityMonitor:
             'recommendations': self._generate_recommendations(is_anomaly, encryption_data)
         }
         
-        # Store in history
-        self.encryption_history.append({
+        entry = {
             'timestamp': datetime.now().isoformat(),
             'data': encryption_data,
             'anomaly_result': result
-        })
+        }
+        
+        # Store in history
+        with self._history_lock:
+            self.encryption_history.append(entry)
+            self._total += 1
+            self._anomalies += int(is_anomaly)
         
         return result
     
+    def _compile_scoring_kernel(self, n_features):
+        """Convert the fitted forest to ONNX so scoring runs in onnxruntime"""
+        self._onnx_model = None
+        self._onnx_session = None
+        self._onnx_pid = None
+        if not ONNX_AVAILABLE:
+            return
+        
+        try:
+            onnx_model = convert_sklearn(
+                self.anomaly_detector,
+                initial_types=[('X', FloatTensorType([None, n_features]))],
+                target_opset={'': 15, 'ai.onnx.ml': 3}
+            ).SerializeToString()
+            # Check that it loads, but don't keep the session: its thread pools
+            # would not survive gunicorn forking the preloaded app
+            self._new_onnx_session(onnx_model)
+            self._onnx_model = onnx_model
+        except Exception as e:
+            print(f"⚠️  ONNX conversion failed, using sklearn scoring: {e}")
+    
+    @staticmethod
+    def _new_onnx_session(onnx_model):
+        return ort.InferenceSession(onnx_model, providers=['CPUExecutionProvider'])
+    
+    def load_scoring_session(self):
+        """Return this process's onnxruntime session, building it on first use
+        
+        Returns:
+            InferenceSession, or None when scoring falls back to sklearn
+        """
+        if self._onnx_model is None:
+            return None
+        if self._onnx_pid != os.getpid():
+            # First call in this process (e.g. a gunicorn worker): never run
+            # a session created before fork()
+            self._onnx_session = self._new_onnx_session(self._onnx_model)
+            self._onnx_pid = os.getpid()
+        return self._onnx_session
+    
+    def _score(self, X):
+        """Return score_samples() for raw (unscaled) feature rows"""
+        X_scaled = (X.astype(np.float32) - self._mean) * self._inv_scale
+        
+        session = self.load_scoring_session()
+        if session is not None:
+            # Outputs are (label, decision_function); shift back by offset_
+            _, scores = session.run(None, {'X': X_scaled})
+            return scores.ravel() + self._offset
+        
+        # Small batches, so keep joblib on a plain in-thread backend
+        with joblib.parallel_backend('threading', n_jobs=1):
+            return self.anomaly_detector.score_samples(X_scaled)
+    
+    def _score_batched(self, features):
+        """Score one feature row via the micro-batching worker"""
+        with self._batch_lock:
+            if self._batch_worker is None:
+                self._batch_worker = threading.Thread(target=self._batch_loop, daemon=True)
+                self._batch_worker.start()
+        
+        # [features, done, score, error]
+        item = [features, threading.Event(), None, None]
+        self._batch_queue.put(item)
+        item[1].wait()
+        if item[3] is not None:
+            raise item[3]
+        return item[2]
+    
+    def _batch_loop(self):
+        """Collect up to BATCH_SIZE rows (or BATCH_WINDOW seconds) and score them together"""
+        while True:
+            items = [self._batch_queue.get()]
+            deadline = time.monotonic() + self.BATCH_WINDOW
+            while len(items) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._batch_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                scores = self._score(np.vstack([item[0] for item in items]))
+                for item, score in zip(items, scores):
+                    item[2] = float(score)
+            except Exception as e:
+                for item in items:
+                    item[3] = e
+            for item in items:
+                item[1].set()
+    
     def _bootstrap_training(self):
         """Generate synthetic baseline data for cold start"""
-        synthetic_data = []
-        
-        # Normal Kyber operations
-        for _ in range(50):
-            synthetic_data.append({
-                'file_size': np.random.normal(50000, 10000),
-                'encryption_time': np.random.normal(0.005, 0.001),
-                'algorithm': 'kyber768',
-                'key_size': 1184,
-                'timestamp': np.random.randint(0, 86400)
-            })
-        
-        # Normal RSA operations
-        for _ in range(30):
-            synthetic_data.append({
-                'file_size': np.random.normal(50000, 10000),
-                'encryption_time': np.random.normal(0.15, 0.03),
-                'algorithm': 'rsa2048',
-                'key_size': 256,
-                'timestamp': np.random.randint(0, 86400)
-            })
-        
-        self.train_baseline(synthetic_data)
+        rng = np.random.default_rng(42)
+        n_kyber, n_rsa = 50, 30  # Normal Kyber / RSA operations
+        n = n_kyber + n_rsa
+        
+        # Same columns as _extract_features_batch, drawn directly
+        X = np.empty((n, self.N_FEATURES), dtype=np.float64)
+        X[:, 0] = rng.normal(50000, 10000, n)
+        X[:n_kyber, 1] = rng.normal(0.005, 0.001, n_kyber) * 1000
+        X[n_kyber:, 1] = rng.normal(0.15, 0.03, n_rsa) * 1000
+        X[:n_kyber, 2] = len('kyber768')
+        X[n_kyber:, 2] = len('rsa2048')
+        X[:n_kyber, 3] = 1184
+        X[n_kyber:, 3] = 256
+        X[:, 4] = rng.integers(0, 86400, n)
+        
+        self._fit(X)
+        print(f"✅ AI model trained on {n} normal operations")
     
     def _calculate_risk_level(self, score):
         """Calculate risk level from anomaly score"""
@@ -159,13 +305,14 @@ class AISecurityMonitor:
     
     def get_security_dashboard(self):
         """Generate security dashboard data"""
-        if not self.encryption_history:
-            return {'total_operations': 0}
-        
-        total = len(self.encryption_history)
-        anomalies = sum(1 for h in self.encryption_history if h['anomaly_result']['is_anomaly'])
+        with self._history_lock:
+            total = self._total
+            anomalies = self._anomalies
+            history = self.encryption_history
+            recent = list(itertools.islice(history, max(0, len(history) - 10), None))
         
-        recent = self.encryption_history[-10:]
+        if not total:
+            return {'total_operations': 0}
         
         return {
             'total_operations': total,
@@ -179,7 +326,6 @@ class MLPerformancePredictor:
     """Predict encryption performance using ML"""
     
     def __init__(self):
-        from sklearn.linear_model import Ridge
         self.model_kyber = Ridge(alpha=1.0)
         self.model_rsa = Ridge(alpha=1.0)
         self.scaler = StandardScaler()
@@ -201,22 +347,30 @@ class MLPerformancePredictor:
         
         self.model_kyber.fit(X_scaled, kyber_times)
         self.model_rsa.fit(X_scaled, rsa_times)
+        
+        # Single-feature linear models: fold scaler + Ridge into a + b*x
+        self._kyber_a, self._kyber_b = self._fold_linear(self.model_kyber)
+        self._rsa_a, self._rsa_b = self._fold_linear(self.model_rsa)
         self.is_trained = True
         
         print("✅ Performance prediction models trained")
     
+    def _fold_linear(self, model):
+        """Return (intercept, slope) of model.predict(scaler.transform(x))"""
+        mean = self.scaler.mean_[0]
+        scale = self.scaler.scale_[0]
+        coef = model.coef_[0]
+        return float(model.intercept_ - coef * mean / scale), float(coef / scale)
+    
     def predict_time(self, file_size, algorithm='kyber768'):
         """Predict encryption time"""
         if not self.is_trained:
             self.train()
         
-        X = np.array([[file_size]])
-        X_scaled = self.scaler.transform(X)
-        
         if 'kyber' in algorithm.lower():
-            predicted = self.model_kyber.predict(X_scaled)[0]
+            predicted = self._kyber_a + self._kyber_b * file_size
         else:
-            predicted = self.model_rsa.predict(X_scaled)[0]
+            predicted = self._rsa_a + self._rsa_b * file_size
         
         return max(0.001, predicted)  # Minimum 1ms
     
@@ -4,34 +4,242 @@ Enhanced Flask Web Application with REAL AI
 Fixed: removed duplicate simulate-attack route and moved imports before main block.
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, after_this_request
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from cachetools import TTLCache, cached
 from file_encryptor import FileEncryptor
+from crypto_engine import CryptoEngine
+from session_store import SessionStore
 from ai_security_monitor import AISecurityMonitor, MLPerformancePredictor
 from quantum_threat_intel import QuantumThreatIntelligence
 from real_ai_assistant import RealTimeAIAssistant  # NEW: Real AI
 from quantum_attack_viz import QuantumAttackSimulator   # moved here (was duplicated after main)
 import os
 import io
+import hashlib
+import orjson
+import queue
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
 
 app = Flask(__name__,
             static_folder='../frontend/static',
             template_folder='../frontend/templates')
 CORS(app)
 
+
+class ORJSONProvider(JSONProvider):
+    """Serve jsonify() and request.json through orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+app.json = ORJSONProvider(app)
+
+# Reject oversized uploads before they are read into memory or written to disk
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 500)) * 1024 * 1024
+
+
+@app.before_request
+def reject_oversized_upload():
+    if request.content_length is not None and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return request_too_large(None)
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'success': False, 'error': f'File too large (limit {limit_mb} MB).'}), 413
+
 # Initialize AI components
 ai_monitor = AISecurityMonitor()
 ml_predictor = MLPerformancePredictor()
 threat_intel = QuantumThreatIntelligence()
 crypto_assistant = RealTimeAIAssistant()  # NEW: Real AI with Groq
-active_encryptors = {}
-encrypted_files = {}  # session_id -> (file_path, original_filename)
 
 # Initialize attack simulator
 attack_simulator = QuantumAttackSimulator()
 
+# Optional Redis for shared sessions and LLM answer caching (set REDIS_URL to enable)
+CHAT_CACHE_TTL = 3600
+SESSION_TTL = 3600
+redis_client = None
+if REDIS_AVAILABLE and os.environ.get('REDIS_URL'):
+    redis_client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(
+        os.environ['REDIS_URL'], max_connections=32
+    ))
+
+# session_id -> encryptor, plus session_id -> pending encrypted download
+sessions = SessionStore(redis_client, ttl=SESSION_TTL)
+
+
+def _chat_cache_key(question):
+    return 'chat:' + hashlib.sha256(question.strip().lower().encode('utf-8')).hexdigest()
+
+
+# Anomaly analysis and LLM calls run here instead of on the request thread;
+# clients poll /api/anomaly-result and /api/chat-result for the outcome.
+# With Redis the outcome is stored under job:{id} so any worker can answer the
+# poll; without it pending_jobs is the single-worker fallback.
+JOB_TTL = 600
+background_executor = ThreadPoolExecutor(max_workers=4)
+pending_jobs = {}  # job_id -> (future, submitted_at)
+_jobs_lock = threading.Lock()
+
+
+def _job_key(job_id):
+    return f'job:{job_id}'
+
+
+def _dump_job(status, value=None):
+    return orjson.dumps(
+        {'status': status, 'value': value},
+        default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def _store_job_outcome(job_id, future):
+    try:
+        outcome = _dump_job('done', future.result())
+    except Exception as e:
+        outcome = _dump_job('error', str(e))
+    try:
+        redis_client.setex(_job_key(job_id), JOB_TTL, outcome)
+    except redis.RedisError as e:
+        print(f"⚠️  Could not store job {job_id}: {e}")
+
+
+def _submit_job(job_id, fn, *args):
+    if redis_client is not None:
+        try:
+            # Mark it pending first so a poll on another worker doesn't 404
+            redis_client.setex(_job_key(job_id), JOB_TTL, _dump_job('pending'))
+        except redis.RedisError as e:
+            print(f"⚠️  Redis unavailable, keeping job {job_id} in this worker: {e}")
+        else:
+            future = background_executor.submit(fn, *args)
+            future.add_done_callback(lambda f: _store_job_outcome(job_id, f))
+            return
+
+    now = time.time()
+    with _jobs_lock:
+        for stale in [j for j, (_, t) in pending_jobs.items() if now - t > JOB_TTL]:
+            del pending_jobs[stale]
+        pending_jobs[job_id] = (background_executor.submit(fn, *args), now)
+
+
+def _job_result(job_id):
+    """Return ('pending'|'done'|'error'|'missing', value) for a background job"""
+    with _jobs_lock:
+        local = job_id in pending_jobs
+
+    if redis_client is not None and not local:
+        try:
+            raw = redis_client.get(_job_key(job_id))
+            if raw is None:
+                return 'missing', None
+            outcome = orjson.loads(raw)
+            if outcome['status'] != 'pending':
+                redis_client.delete(_job_key(job_id))
+            return outcome['status'], outcome['value']
+        except redis.RedisError as e:
+            return 'error', str(e)
+
+    with _jobs_lock:
+        entry = pending_jobs.get(job_id)
+        if entry is None:
+            return 'missing', None
+        future = entry[0]
+        if not future.done():
+            return 'pending', None
+        del pending_jobs[job_id]
+    try:
+        return 'done', future.result()
+    except Exception as e:
+        return 'error', str(e)
+
+
+def _answer_question(question, cache_key):
+    # Use REAL AI to answer
+    answer = crypto_assistant.ask(question)
+
+    if redis_client is not None and crypto_assistant.enabled and not answer.startswith('⚠️ AI Error'):
+        try:
+            redis_client.setex(cache_key, CHAT_CACHE_TTL, answer)
+        except redis.RedisError:
+            pass
+    return answer
+
+
+# Benchmarks and threat reports only depend on static inputs
+@cached(TTLCache(maxsize=4, ttl=300))
+def _cached_benchmarks():
+    from compare_algorithms import benchmark_kyber, benchmark_rsa
+    return benchmark_kyber(50), benchmark_rsa(50)
+
+
+@cached(TTLCache(maxsize=4, ttl=3600))
+def _cached_threat_intel():
+    return threat_intel.generate_threat_report(), threat_intel.predict_breaking_timeline('RSA-2048')
+
+
+# Pre-generated encryptors so /api/generate-keys doesn't wait on keygen
+KEY_POOL_SIZE = 8
+key_pools = {algorithm: queue.Queue(maxsize=KEY_POOL_SIZE) for algorithm in CryptoEngine.ALGORITHMS}
+
+
+def _fill_key_pool(algorithm):
+    pool = key_pools[algorithm]
+    while True:
+        try:
+            encryptor = FileEncryptor(algorithm)
+            encryptor.generate_keys()
+        except Exception as e:
+            print(f"⚠️  Key pool for {algorithm} stopped: {e}")
+            return
+        pool.put(encryptor)  # blocks while the pool is full
+
+
+def _start_key_pools():
+    for algorithm in key_pools:
+        threading.Thread(target=_fill_key_pool, args=(algorithm,), daemon=True).start()
+
+
+def start_background_workers():
+    """Start warmup, key pool and session sweeper threads (once per process)"""
+    threading.Thread(target=_warmup, daemon=True).start()
+    _start_key_pools()
+    sessions.start_sweeper()
+
+
+def _warmup():
+    """Pay model training and liboqs/PyCryptodome init costs before the first request"""
+    try:
+        if not ml_predictor.is_trained:
+            ml_predictor.train()
+        ai_monitor.load_scoring_session()
+        encryptor = FileEncryptor('kyber768')
+        keys = encryptor.generate_keys()
+        encryptor.engine.encrypt_data(b'\0' * 1024, keys)
+        print("✅ Warmup complete")
+    except Exception as e:
+        print(f"⚠️  Warmup failed: {e}")
+
 
 @app.route('/')
 def index():
@@ -44,11 +252,15 @@ def generate_keys():
         data = request.json
         algorithm = data.get('algorithm', 'kyber768')
 
-        encryptor = FileEncryptor(algorithm)
-        keys = encryptor.generate_keys()
+        try:
+            encryptor = key_pools[algorithm].get_nowait()
+        except (KeyError, queue.Empty):
+            encryptor = FileEncryptor(algorithm)
+            encryptor.generate_keys()
+        keys = encryptor.keys
 
         session_id = os.urandom(16).hex()
-        active_encryptors[session_id] = encryptor
+        sessions.add_encryptor(session_id, encryptor)
 
         return jsonify({
             'success': True,
@@ -69,23 +281,19 @@ def encrypt_file():
         file = request.files['file']
         session_id = request.form.get('session_id')
 
-        if not session_id or session_id not in active_encryptors:
+        encryptor = sessions.get_encryptor(session_id)
+        if encryptor is None:
             return jsonify({'success': False, 'error': 'Invalid session'}), 400
 
-        encryptor = active_encryptors[session_id]
-
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_input:
-            file.save(tmp_input.name)
-            input_path = tmp_input.name
+        original_filename = file.filename or 'file'
 
+        # Encrypt straight from the upload stream; only the output touches disk
         with tempfile.NamedTemporaryFile(delete=False, suffix='.encrypted') as tmp_output:
-            output_path = tmp_output.name
-
-        original_filename = file.filename or 'file'
-        encrypted_path, metadata = encryptor.encrypt_file(input_path, output_path)
+            metadata = encryptor.encrypt_stream(file.stream, tmp_output, original_filename)
+            encrypted_path = tmp_output.name
 
         # Store encrypted file path so it can be downloaded later
-        encrypted_files[session_id] = (encrypted_path, original_filename)
+        sessions.add_encrypted_file(session_id, encrypted_path, original_filename)
 
         # AI anomaly detection
         encryption_data = {
@@ -96,9 +304,7 @@ def encrypt_file():
             'timestamp': time.time()
         }
 
-        anomaly_result = ai_monitor.detect_anomaly(encryption_data)
-
-        os.unlink(input_path)
+        _submit_job(f'anomaly:{session_id}', ai_monitor.detect_anomaly, encryption_data)
 
         return jsonify({
             'success': True,
@@ -107,7 +313,8 @@ def encrypt_file():
                 'encryption_time': metadata['encryption_time'],
                 'original_size': metadata['original_size'],
             },
-            'ai_analysis': anomaly_result,
+            'ai_analysis': None,
+            'ai_pending': True,  # fetch from /api/anomaly-result
             'download_ready': True
         })
     except Exception as e:
@@ -117,10 +324,7 @@ def encrypt_file():
 @app.route('/api/benchmark', methods=['POST'])
 def run_benchmark():
     try:
-        from compare_algorithms import benchmark_kyber, benchmark_rsa
-
-        kyber_results = benchmark_kyber(50)
-        rsa_results = benchmark_rsa(50)
+        kyber_results, rsa_results = _cached_benchmarks()
 
         return jsonify({
             'success': True,
@@ -135,8 +339,7 @@ def run_benchmark():
 def get_threat_intel():
     """Get quantum threat intelligence"""
     try:
-        report = threat_intel.generate_threat_report()
-        rsa2048 = threat_intel.predict_breaking_timeline('RSA-2048')
+        report, rsa2048 = _cached_threat_intel()
 
         return jsonify({
             'success': True,
@@ -177,8 +380,26 @@ def chat():
         if not question:
             return jsonify({'success': False, 'error': 'No question provided'}), 400
 
-        # Use REAL AI to answer
-        answer = crypto_assistant.ask(question)
+        # Repeated questions are served from the cache instead of the LLM
+        cache_key = _chat_cache_key(question)
+        answer = None
+        if redis_client is not None and crypto_assistant.enabled:
+            try:
+                cached = redis_client.get(cache_key)
+                if cached is not None:
+                    answer = cached.decode('utf-8')
+            except redis.RedisError:
+                pass
+
+        if answer is None:
+            job_id = os.urandom(16).hex()
+            _submit_job(f'chat:{job_id}', _answer_question, question, cache_key)
+            return jsonify({
+                'success': True,
+                'answer': None,
+                'job_id': job_id,  # fetch from /api/chat-result
+                'ai_powered': crypto_assistant.enabled
+            })
 
         return jsonify({
             'success': True,
@@ -190,6 +411,40 @@ def chat():
         return jsonify({'success': False, 'error': str(e)}), 400
 
 
+@app.route('/api/chat-result', methods=['GET'])
+def chat_result():
+    """Poll for the answer to a queued /api/chat question"""
+    status, value = _job_result(f"chat:{request.args.get('job_id')}")
+    if status == 'missing':
+        return jsonify({'success': False, 'error': 'Unknown chat job'}), 404
+    if status == 'pending':
+        return jsonify({'success': True, 'status': 'pending'})
+    if status == 'error':
+        return jsonify({'success': False, 'error': value}), 500
+
+    return jsonify({
+        'success': True,
+        'status': 'done',
+        'answer': value,
+        'timestamp': time.time(),
+        'ai_powered': crypto_assistant.enabled
+    })
+
+
+@app.route('/api/anomaly-result', methods=['GET'])
+def anomaly_result():
+    """Poll for the AI analysis of the session's last encryption"""
+    status, value = _job_result(f"anomaly:{request.args.get('session_id')}")
+    if status == 'missing':
+        return jsonify({'success': False, 'error': 'No pending analysis for this session'}), 404
+    if status == 'pending':
+        return jsonify({'success': True, 'status': 'pending'})
+    if status == 'error':
+        return jsonify({'success': False, 'error': value}), 500
+
+    return jsonify({'success': True, 'status': 'done', 'ai_analysis': value})
+
+
 @app.route('/api/security-dashboard', methods=['GET'])
 def security_dashboard():
     """Get AI security monitoring dashboard"""
@@ -208,34 +463,33 @@ def security_dashboard():
 def download_encrypted():
     """Download the encrypted file for a given session"""
     session_id = request.args.get('session_id')
-    if not session_id or session_id not in encrypted_files:
+    pending = sessions.pop_encrypted_file(session_id)  # remove immediately
+    if pending is None:
         return jsonify({'success': False, 'error': 'No encrypted file found for this session'}), 404
 
-    file_path, original_filename = encrypted_files.pop(session_id)  # remove immediately
+    file_path, original_filename = pending
     download_name = original_filename + '.encrypted'
 
-    try:
-        # Read entire file into memory first, then delete the temp file
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-    except Exception as e:
-        return jsonify({'success': False, 'error': f'Could not read encrypted file: {e}'}), 500
-    finally:
-        # Always clean up the temp file
+    @after_this_request
+    def cleanup(response):
+        # send_file already holds an open handle, so unlinking is safe
         try:
             os.unlink(file_path)
         except Exception:
             pass
+        return response
 
-    # Serve from memory — 100% reliable, no streaming race condition
-    buf = io.BytesIO(file_data)
-    buf.seek(0)
-    return send_file(
-        buf,
-        as_attachment=True,
-        download_name=download_name,
-        mimetype='application/octet-stream'
-    )
+    # Stream from disk so memory stays flat regardless of file size
+    try:
+        return send_file(
+            file_path,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype='application/octet-stream',
+            conditional=True
+        )
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Could not read encrypted file: {e}'}), 500
 
 
 @app.route('/api/simulate-attack', methods=['POST'])
@@ -246,7 +500,7 @@ def simulate_attack():
         algorithm = data.get('algorithm', 'rsa')
         key_size = data.get('key_size', 2048)
 
-        stages = attack_simulator.simulate_attack(algorithm, key_size)
+        stages = list(attack_simulator.simulate_attack(algorithm, key_size))
 
         return jsonify({
             'success': True,
@@ -262,15 +516,14 @@ def simulate_attack():
 def export_keys():
     """Download the current session's keys as a JSON file."""
     session_id = request.args.get('session_id')
-    if not session_id or session_id not in active_encryptors:
+    encryptor = sessions.get_encryptor(session_id)
+    if encryptor is None:
         return jsonify({'success': False, 'error': 'No active session.'}), 400
 
-    encryptor = active_encryptors[session_id]
     if not encryptor.keys:
         return jsonify({'success': False, 'error': 'No keys in session.'}), 400
 
-    import json as _json
-    keys_json = _json.dumps(encryptor.keys, indent=2).encode('utf-8')
+    keys_json = orjson.dumps(encryptor.keys, option=orjson.OPT_INDENT_2)
     buf = io.BytesIO(keys_json)
     buf.seek(0)
     return send_file(
@@ -289,9 +542,8 @@ def import_keys():
             return jsonify({'success': False, 'error': 'No key file provided.'}), 400
 
         keyfile = request.files['keyfile']
-        import json as _json
         try:
-            keys = _json.loads(keyfile.read().decode('utf-8'))
+            keys = orjson.loads(keyfile.read())
         except Exception:
             return jsonify({'success': False, 'error': 'Invalid key file format. Must be a QBits JSON key file.'}), 400
 
@@ -299,24 +551,14 @@ def import_keys():
         encryptor = FileEncryptor(algorithm)
         encryptor.keys = keys
 
-        # Restore the live KEM object so decryption actually works
-        from crypto_engine import CryptoEngine
-        import base64
+        # Parse the keys now so a bad key file fails here, not on decrypt
         try:
-            if 'kyber_secret' in keys:
-                from oqs import KeyEncapsulation
-                encryptor.engine.kyber_kem = KeyEncapsulation("Kyber768")
-                encryptor.engine.kyber_kem.generate_keypair()  # init structure
-                # Re-import the secret key
-                secret_bytes = base64.b64decode(keys['kyber_secret'])
-                # Directly set the secret key via a fresh KEM using secret bytes
-                kem2 = KeyEncapsulation("Kyber768", secret_bytes)
-                encryptor.engine.kyber_kem = kem2
+            encryptor.engine.bind_keys(keys, keys)
         except Exception as e:
-            return jsonify({'success': False, 'error': f'Failed to restore KEM from key file: {e}'}), 500
+            return jsonify({'success': False, 'error': f'Failed to load keys from key file: {e}'}), 500
 
         session_id = os.urandom(16).hex()
-        active_encryptors[session_id] = encryptor
+        sessions.add_encryptor(session_id, encryptor)
 
         return jsonify({
             'success': True,
@@ -334,7 +576,8 @@ def decrypt_file():
     """Decrypt a previously encrypted file and stream it back."""
     try:
         session_id = request.form.get('session_id')
-        if not session_id or session_id not in active_encryptors:
+        encryptor = sessions.get_encryptor(session_id)
+        if encryptor is None:
             return jsonify({'success': False, 'error': 'No active session. Please generate keys first.'}), 400
 
         if 'file' not in request.files:
@@ -344,50 +587,31 @@ def decrypt_file():
         if uploaded_file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected.'}), 400
 
-        # Read the encrypted JSON into memory
-        file_bytes = uploaded_file.read()
-
-        import json as _json
-        try:
-            encrypted_data = _json.loads(file_bytes.decode('utf-8'))
-        except Exception:
-            return jsonify({'success': False, 'error': 'File is not a valid QBits encrypted JSON.'}), 400
-
-        encryptor = active_encryptors[session_id]
-
-        # Write to a temp file so the encryptor can read it
-        with tempfile.NamedTemporaryFile(suffix='.encrypted', delete=False) as tmp_in:
-            tmp_in.write(file_bytes)
-            tmp_in_path = tmp_in.name
-
-        tmp_out_path = None
-        try:
-            output_path, decrypted_data = encryptor.decrypt_file(tmp_in_path)
-            tmp_out_path = output_path
-
-            # Determine the original filename from the encrypted metadata
-            original_filename = encrypted_data.get('original_filename', 'decrypted_file')
-
-            buf = io.BytesIO(decrypted_data)
-            buf.seek(0)
-            return send_file(
-                buf,
-                as_attachment=True,
-                download_name=original_filename,
-                mimetype='application/octet-stream'
-            )
-        except Exception as e:
-            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}'}), 500
-        finally:
+        # Decrypt chunk by chunk from the upload stream into a temp file
+        with tempfile.NamedTemporaryFile(suffix='.decrypted', delete=False) as tmp_out:
             try:
-                os.unlink(tmp_in_path)
+                metadata = encryptor.decrypt_stream(uploaded_file.stream, tmp_out)
+            except Exception as e:
+                tmp_out.close()
+                os.unlink(tmp_out.name)
+                return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}'}), 500
+        tmp_out_path = tmp_out.name
+
+        @after_this_request
+        def cleanup(response):
+            # send_file already holds an open handle, so unlinking is safe
+            try:
+                os.unlink(tmp_out_path)
             except Exception:
                 pass
-            if tmp_out_path:
-                try:
-                    os.unlink(tmp_out_path)
-                except Exception:
-                    pass
+            return response
+
+        return send_file(
+            tmp_out_path,
+            as_attachment=True,
+            download_name=metadata['original_filename'],
+            mimetype='application/octet-stream'
+        )
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -414,4 +638,7 @@ if __name__ == '__main__':
     print("\n⚠️  Press Ctrl+C to stop\n")
     print("=" * 70)
 
+    start_background_workers()
+
+    # Development server; production runs gunicorn (see gunicorn_conf.py)
     app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
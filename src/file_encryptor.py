@@ -5,10 +5,77 @@ Encrypts and decrypts files using quantum-safe algorithms
 """
 
 import os
+import filecmp
 import json
+import orjson
+import struct
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from crypto_engine import CryptoEngine
+from crypto_engine import CryptoEngine, GCM_TAG_SIZE
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+    _JSON_ERRORS = (ValueError, ijson.JSONError)
+except ImportError:
+    IJSON_AVAILABLE = False
+    _JSON_ERRORS = (ValueError,)
+
+# Container: HEADER (magic, container version, metadata length), JSON metadata,
+# the raw key-exchange fields it lists, then u32-length-prefixed chunk frames.
+# Files without the magic are the older single JSON document.
+STREAM_MAGIC = b'QBS1'
+CONTAINER_VERSION = 1
+HEADER = struct.Struct('<4sBI')
+CHUNK_SIZE = 1 << 20
+PROGRESS_EVERY = 100  # encrypt_directory progress line interval, in files
+_LENGTH = struct.Struct('<I')
+# Upper bounds on the lengths a container declares, checked before reading, so
+# a corrupt or hostile file can't make a u32 length allocate gigabytes
+MAX_METADATA_SIZE = 64 * 1024
+MAX_KEY_FIELDS = 16
+MAX_KEY_FIELD_SIZE = 16 * 1024  # Kyber ciphertexts and RSA blocks are a few KB
+MAX_CHUNK_SIZE = 16 * CHUNK_SIZE
+
+def _fadvise(f, advice_name):
+    """Page-cache hint for the whole file; skipped where posix_fadvise is missing"""
+    advice = getattr(os, advice_name, None)
+    if advice is not None:
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, advice)
+        except OSError:
+            pass
+
+def _read_exact(f, size):
+    """Read exactly size bytes or fail on a truncated file"""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Encrypted file is truncated")
+    return data
+
+def _read_frame(f, max_length):
+    """Next length-prefixed frame, or None at end of file"""
+    prefix = f.read(_LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) != _LENGTH.size:
+        raise ValueError("Encrypted file is truncated")
+    (length,) = _LENGTH.unpack(prefix)
+    if length > max_length:
+        raise ValueError(f"Encrypted frame too large: {length} bytes")
+    return _read_exact(f, length)
+
+def _walk_files(root):
+    """Yield the path of every regular file under root (symlinks not followed)"""
+    # DirEntry type checks come from the directory listing, so no stat per entry
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry.path
 
 class FileEncryptor:
     """Handle file encryption and decryption"""
@@ -17,9 +84,15 @@ class FileEncryptor:
         self.engine = CryptoEngine(algorithm)
         self.keys = None
         
-    def generate_keys(self, save_to=None):
-        """Generate and optionally save keys"""
-        self.keys = self.engine.generate_keys()
+    def generate_keys(self, save_to=None, from_keys=None):
+        """
+        Generate and optionally save keys; from_keys adopts an existing key
+        set instead (e.g. a hybrid set for kyber768 or rsa2048)
+        """
+        if from_keys is None:
+            self.keys = self.engine.generate_keys()
+        else:
+            self.keys = self.engine.set_keys(from_keys)
         
         if save_to:
             # Save keys to files
@@ -36,13 +109,11 @@ class FileEncryptor:
                 elif 'private' in key or 'secret' in key:
                     private_keys[key] = value
             
-            # Save public keys
-            with open(public_key_file, 'w') as f:
-                json.dump(public_keys, f, indent=2)
+            # Save public keys (serialized in C, written with one call)
+            public_key_file.write_bytes(orjson.dumps(public_keys, option=orjson.OPT_INDENT_2))
             
             # Save private keys (with warning)
-            with open(private_key_file, 'w') as f:
-                json.dump(private_keys, f, indent=2)
+            private_key_file.write_bytes(orjson.dumps(private_keys, option=orjson.OPT_INDENT_2))
             
             # Set restrictive permissions on private key
             os.chmod(private_key_file, 0o600)
@@ -72,9 +143,9 @@ class FileEncryptor:
         
         return self.keys
     
-    def encrypt_file(self, input_file, output_file=None):
+    def encrypt_file(self, input_file, output_file=None, verbose=True):
         """
-        Encrypt a file
+        Encrypt a file (verbose=False skips the per-file report)
         Returns: (output_file_path, metadata)
         """
         input_path = Path(input_file)
@@ -86,37 +157,167 @@ class FileEncryptor:
         if output_file is None:
             output_file = str(input_path) + '.encrypted'
         
-        print(f"📄 Encrypting: {input_path.name}")
-        print(f"   Size: {input_path.stat().st_size:,} bytes")
-        
-        # Read file
-        start_time = time.time()
-        with open(input_path, 'rb') as f:
-            data = f.read()
-        read_time = time.time() - start_time
+        if verbose:
+            print(f"📄 Encrypting: {input_path.name}")
+            print(f"   Size: {input_path.stat().st_size:,} bytes")
+            print(f"   🔒 Encrypting with {self.keys['algorithm']}...")
         
         # Encrypt
-        print(f"   🔒 Encrypting with {self.keys['algorithm']}...")
-        encrypted = self.engine.encrypt_data(data, self.keys)
+        # Read once front to back: ask for read-ahead, then drop the pages
+        # so big files don't evict other jobs' cache
+        with open(input_path, 'rb') as fin, open(output_file, 'wb') as fout:
+            _fadvise(fin, 'POSIX_FADV_SEQUENTIAL')
+            _fadvise(fout, 'POSIX_FADV_SEQUENTIAL')
+            encrypted = self.encrypt_stream(fin, fout, input_path.name)
+            _fadvise(fin, 'POSIX_FADV_DONTNEED')
+        data_size = encrypted['original_size']
+        
+        if verbose:
+            output_size = Path(output_file).stat().st_size
+            print(f"   ✅ Encrypted in {encrypted['encryption_time']*1000:.2f}ms")
+            print(f"   💾 Output: {output_file}")
+            print(f"   📊 Size: {output_size:,} bytes (overhead: {((output_size/max(data_size, 1))-1)*100:.1f}%)")
         
-        # Add file metadata
-        encrypted['original_filename'] = input_path.name
-        encrypted['original_size'] = len(data)
-        encrypted['encrypted_at'] = time.time()
-        
-        # Save encrypted file
+        return output_file, encrypted
+    
+    def encrypt_stream(self, in_file, out_file, original_filename='file'):
+        """
+        Encrypt everything read from in_file into out_file (binary streams),
+        CHUNK_SIZE bytes at a time
+        Returns: metadata
+        """
         start_time = time.time()
-        with open(output_file, 'w') as f:
-            json.dump(encrypted, f, indent=2)
-        write_time = time.time() - start_time
-        
-        output_size = Path(output_file).stat().st_size
         
-        print(f"   ✅ Encrypted in {encrypted['encryption_time']*1000:.2f}ms")
-        print(f"   💾 Output: {output_file}")
-        print(f"   📊 Size: {output_size:,} bytes (overhead: {((output_size/len(data))-1)*100:.1f}%)")
+        stream_key, key_fields = self.engine.start_stream(self.keys, encode=False)
+        metadata = {
+            'algorithm': self.engine.algorithm,
+            'chunk_size': CHUNK_SIZE,
+            'original_filename': original_filename,
+            'encrypted_at': time.time(),
+            'key_fields': {name: len(value) for name, value in key_fields.items()}
+        }
+        metadata_bytes = json.dumps(metadata).encode('utf-8')
+        header_bytes = b''.join([
+            HEADER.pack(STREAM_MAGIC, CONTAINER_VERSION, len(metadata_bytes)),
+            metadata_bytes,
+            *key_fields.values()
+        ])
+        out_file.write(header_bytes)
+        
+        # Each frame (length prefix, ciphertext, tag) is built in one reused
+        # buffer and written with a single call.
+        # Read one chunk ahead so the last frame can be marked final;
+        # the first frame also authenticates the header
+        frame_buffer = bytearray(_LENGTH.size + CHUNK_SIZE + GCM_TAG_SIZE)
+        original_size = 0
+        index = 0
+        chunk = in_file.read(CHUNK_SIZE)
+        while True:
+            next_chunk = in_file.read(CHUNK_SIZE) if chunk else b''
+            final = not next_chunk
+            frame_len = len(chunk) + GCM_TAG_SIZE
+            if _LENGTH.size + frame_len > len(frame_buffer):
+                frame_buffer = bytearray(_LENGTH.size + frame_len)
+            frame = memoryview(frame_buffer)[:_LENGTH.size + frame_len]
+            _LENGTH.pack_into(frame, 0, frame_len)
+            CryptoEngine.encrypt_chunk(stream_key, index, chunk, final,
+                                       header_bytes if index == 0 else b'',
+                                       output=frame[_LENGTH.size:])
+            out_file.write(frame)
+            original_size += len(chunk)
+            if final:
+                break
+            chunk = next_chunk
+            index += 1
+        
+        return {
+            'algorithm': metadata['algorithm'],
+            'original_filename': original_filename,
+            'original_size': original_size,
+            'encrypted_at': metadata['encrypted_at'],
+            'chunk_count': index + 1,
+            'encryption_time': time.time() - start_time
+        }
+    
+    def decrypt_stream(self, in_file, out_file):
+        """
+        Decrypt an encrypted container read from in_file into out_file
+        Returns: metadata
+        """
+        fixed = in_file.read(HEADER.size)
+        if fixed[:len(STREAM_MAGIC)] != STREAM_MAGIC:
+            return self._decrypt_legacy(in_file, fixed, out_file)
+        if len(fixed) != HEADER.size:
+            raise ValueError("Encrypted file is truncated")
+        
+        _, version, metadata_len = HEADER.unpack(fixed)
+        if version != CONTAINER_VERSION:
+            raise ValueError(f"Unsupported container version: {version}")
+        if metadata_len > MAX_METADATA_SIZE:
+            raise ValueError(f"Container metadata too large: {metadata_len} bytes")
+        metadata_bytes = _read_exact(in_file, metadata_len)
+        metadata = json.loads(metadata_bytes)
+        
+        field_lengths = metadata['key_fields']
+        if len(field_lengths) > MAX_KEY_FIELDS or not all(
+                isinstance(length, int) and 0 <= length <= MAX_KEY_FIELD_SIZE
+                for length in field_lengths.values()):
+            raise ValueError("Invalid key fields in container metadata")
+        chunk_size = metadata.get('chunk_size', CHUNK_SIZE)
+        if not isinstance(chunk_size, int) or not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Invalid chunk size in container metadata: {chunk_size}")
+        max_frame = chunk_size + GCM_TAG_SIZE
+        
+        key_fields = {
+            name: _read_exact(in_file, length)
+            for name, length in field_lengths.items()
+        }
+        header_bytes = b''.join([fixed, metadata_bytes, *key_fields.values()])
+        stream_key = self.engine.resume_stream(metadata['algorithm'], key_fields, self.keys)
+        
+        original_size = 0
+        index = 0
+        frame = _read_frame(in_file, max_frame)
+        if frame is None:
+            raise ValueError("Encrypted file is truncated")
+        while frame is not None:
+            next_frame = _read_frame(in_file, max_frame)
+            chunk = CryptoEngine.decrypt_chunk(stream_key, index, frame, next_frame is None,
+                                               header_bytes if index == 0 else b'')
+            out_file.write(chunk)
+            original_size += len(chunk)
+            frame = next_frame
+            index += 1
+        
+        return {
+            'algorithm': metadata['algorithm'],
+            'original_filename': metadata.get('original_filename', 'decrypted_file'),
+            'original_size': original_size
+        }
+    
+    def _decrypt_legacy(self, in_file, prefix, out_file):
+        """
+        Decrypt a file from before chunked containers (one JSON document);
+        prefix is what decrypt_stream already read from in_file
+        """
+        try:
+            if IJSON_AVAILABLE and in_file.seekable():
+                # Build the fields straight off the stream rather than holding
+                # the raw document and its parsed copy at the same time
+                in_file.seek(-len(prefix), os.SEEK_CUR)
+                encrypted_data = dict(ijson.kvitems(in_file, '', use_float=True))
+            else:
+                encrypted_data = json.loads(prefix + in_file.read())
+        except _JSON_ERRORS:
+            raise ValueError("File is not a valid QBits encrypted file")
         
-        return output_file, encrypted
+        decrypted_data = self.engine.decrypt_data(encrypted_data, self.keys)
+        out_file.write(decrypted_data)
+        return {
+            'algorithm': encrypted_data['algorithm'],
+            'original_filename': encrypted_data.get('original_filename', 'decrypted_file'),
+            'original_size': len(decrypted_data)
+        }
     
     def decrypt_file(self, input_file, output_file=None):
         """
@@ -130,33 +331,36 @@ class FileEncryptor:
         
         print(f"📄 Decrypting: {input_path.name}")
         
-        # Read encrypted file
-        with open(input_path, 'r') as f:
-            encrypted_data = json.load(f)
-        
-        # Default output file
-        if output_file is None:
-            original_name = encrypted_data.get('original_filename', 'decrypted_file')
-            output_file = str(input_path.parent / f"decrypted_{original_name}")
-        
-        # Decrypt
-        print(f"   🔓 Decrypting with {encrypted_data['algorithm']}...")
+        # Decrypt into a temp file and only move it into place once every
+        # chunk has verified, so a tampered file never leaves partial output
+        target_dir = Path(output_file).parent if output_file else input_path.parent
         start_time = time.time()
-        decrypted_data = self.engine.decrypt_data(encrypted_data, self.keys)
+        with open(input_path, 'rb') as fin, \
+                tempfile.NamedTemporaryFile(dir=target_dir, delete=False) as fout:
+            _fadvise(fin, 'POSIX_FADV_SEQUENTIAL')
+            try:
+                metadata = self.decrypt_stream(fin, fout)
+                _fadvise(fin, 'POSIX_FADV_DONTNEED')
+            except BaseException:
+                fout.close()
+                os.unlink(fout.name)
+                raise
         decrypt_time = (time.time() - start_time) * 1000
         
-        # Save decrypted file
-        with open(output_file, 'wb') as f:
-            f.write(decrypted_data)
+        # Default output file
+        if output_file is None:
+            output_file = str(input_path.parent / f"decrypted_{Path(metadata['original_filename']).name}")
+        os.replace(fout.name, output_file)
         
+        print(f"   🔓 Decrypted with {metadata['algorithm']}")
         print(f"   ✅ Decrypted in {decrypt_time:.2f}ms")
         print(f"   💾 Output: {output_file}")
-        print(f"   📊 Size: {len(decrypted_data):,} bytes")
+        print(f"   📊 Size: {metadata['original_size']:,} bytes")
         
-        return output_file, decrypted_data
+        return output_file, metadata
     
-    def encrypt_directory(self, input_dir, output_dir=None):
-        """Encrypt all files in a directory"""
+    def encrypt_directory(self, input_dir, output_dir=None, max_workers=None):
+        """Encrypt all files in a directory, max_workers processes at a time (default: CPU count)"""
         input_path = Path(input_dir)
         
         if output_dir is None:
@@ -166,25 +370,36 @@ class FileEncryptor:
         output_path.mkdir(exist_ok=True)
         
         # Get all files
-        files = [f for f in input_path.rglob('*') if f.is_file()]
+        files = list(_walk_files(input_path))
         
         print(f"\n📁 Encrypting directory: {input_dir}")
         print(f"   Files found: {len(files)}")
         print(f"   Output: {output_dir}\n")
         
+        output_files = [
+            output_path / f"{os.path.relpath(file, input_path)}.encrypted"
+            for file in files
+        ]
+        
+        # One mkdir per distinct output directory, parents before children
+        for directory in sorted({f.parent for f in output_files}, key=lambda d: len(d.parts)):
+            directory.mkdir(parents=True, exist_ok=True)
+        
+        # Files are independent, so spread them over processes (no GIL);
+        # each worker receives the keys once through the initializer
         results = []
-        for i, file in enumerate(files, 1):
-            print(f"[{i}/{len(files)}]")
-            relative_path = file.relative_to(input_path)
-            output_file = output_path / f"{relative_path}.encrypted"
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            try:
-                encrypted_file, metadata = self.encrypt_file(file, output_file)
-                results.append({'file': str(file), 'status': 'success', 'output': encrypted_file})
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                results.append({'file': str(file), 'status': 'error', 'error': str(e)})
+        if files:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(self.engine.algorithm, self.keys,
+                                               self.engine.verify_rsa_half)) as executor:
+                # Workers stay quiet; report failures as they come and
+                # overall progress on one line, every PROGRESS_EVERY files
+                for i, result in enumerate(executor.map(_encrypt_one, files, output_files, chunksize=4), 1):
+                    results.append(result)
+                    if result['status'] != 'success':
+                        print(f"\r   ❌ {result['file']}: {result['error']}")
+                    if i % PROGRESS_EVERY == 0 or i == len(files):
+                        print(f"\r   Processed {i}/{len(files)} files", end='', flush=True)
             print()
         
         # Summary
@@ -199,6 +414,23 @@ class FileEncryptor:
         
         return results
 
+# Per-process encryptor for encrypt_directory's worker pool
+_worker_encryptor = None
+
+def _init_worker(algorithm, keys, verify_rsa_half):
+    global _worker_encryptor
+    _worker_encryptor = FileEncryptor(algorithm)
+    _worker_encryptor.engine.verify_rsa_half = verify_rsa_half
+    _worker_encryptor.keys = keys
+
+def _encrypt_one(input_file, output_file):
+    """Encrypt one file in a worker process; returns its result entry"""
+    try:
+        encrypted_file, metadata = _worker_encryptor.encrypt_file(input_file, output_file, verbose=False)
+        return {'file': str(input_file), 'status': 'success', 'output': encrypted_file}
+    except Exception as e:
+        return {'file': str(input_file), 'status': 'error', 'error': str(e)}
+
 def demo():
     """Demonstrate file encryption"""
     print("="*70)
@@ -226,6 +458,11 @@ def demo():
             f.write(content)
         print(f"   ✅ Created: {filename} ({len(content)} bytes)")
     
+    # A hybrid key set holds both Kyber and RSA keys, so generate it once
+    # and let every algorithm adopt its part (RSA keygen dominates the demo)
+    print("\n🔑 Generating one hybrid key set for all algorithms...")
+    shared_keys = CryptoEngine('hybrid').generate_keys()
+    
     # Test each algorithm
     for algorithm in ['kyber768', 'rsa2048', 'hybrid']:
         print(f"\n{'='*70}")
@@ -235,11 +472,11 @@ def demo():
         # Initialize encryptor
         encryptor = FileEncryptor(algorithm)
         
-        # Generate and save keys
-        print(f"\n🔑 Generating {algorithm} keys...")
+        # Adopt and save keys
+        print(f"\n🔑 Using {algorithm} keys...")
         algo_keys_dir = keys_dir / algorithm
         algo_keys_dir.mkdir(exist_ok=True)
-        encryptor.generate_keys(save_to=algo_keys_dir)
+        encryptor.generate_keys(save_to=algo_keys_dir, from_keys=shared_keys)
         
         # Encrypt files
         print(f"\n🔒 Encrypting files...")
@@ -253,13 +490,8 @@ def demo():
         decrypted_file = test_dir / f'document_{algorithm}_decrypted.txt'
         encryptor.decrypt_file(output_file, decrypted_file)
         
-        # Verify
-        with open(test_file, 'r') as f:
-            original = f.read()
-        with open(decrypted_file, 'r') as f:
-            decrypted = f.read()
-        
-        if original == decrypted:
+        # Verify (chunked byte compare, without reading either file whole)
+        if filecmp.cmp(test_file, decrypted_file, shallow=False):
             print(f"   ✅ Verification PASSED!")
         else:
             print(f"   ❌ Verification FAILED!")
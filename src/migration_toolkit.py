@@ -6,10 +6,42 @@ Assesses cryptographic systems and provides migration roadmap
 
 import os
 import re
-import json
+import orjson
+import mmap
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
-import hashlib
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+
+def _compile_hyperscan(patterns_by_type):
+    """Compile every pattern into one Hyperscan database
+    
+    Returns:
+        (database, [crypto_type indexed by pattern id])
+    """
+    types = []
+    expressions = []
+    for crypto_type, patterns in patterns_by_type.items():
+        for pattern in patterns:
+            types.append(crypto_type)
+            expressions.append(pattern.encode())
+    
+    db = hyperscan.Database()
+    db.compile(
+        expressions=expressions,
+        ids=list(range(len(expressions))),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(expressions)
+    )
+    return db, types
+
 
 class MigrationAssessment:
     """Assess current cryptographic infrastructure"""
@@ -33,9 +65,38 @@ class MigrationAssessment:
         ]
     }
     
+    # Source files worth scanning, and directories never worth descending into
+    SCAN_EXTENSIONS = frozenset(('.py', '.java', '.js', '.cpp', '.c', '.h', '.go', '.rs', '.sh'))
+    SKIP_DIRS = frozenset(('.git', 'node_modules', 'venv', '.venv', '__pycache__', 'dist', 'build'))
+    
+    # Every pattern in one case-insensitive alternation; the group name
+    # ("<type>__<index>") tells which crypto type matched
+    _COMBINED_PATTERN = re.compile(
+        '|'.join(
+            f'(?P<{crypto_type}__{i}>{pattern})'
+            for crypto_type, patterns in VULNERABLE_PATTERNS.items()
+            for i, pattern in enumerate(patterns)
+        ),
+        re.IGNORECASE
+    )
+    
+    # Group name -> crypto type, so matches need no string splitting
+    _GROUP_TYPES = {name: name.split('__')[0] for name in _COMBINED_PATTERN.groupindex}
+    
+    # Byte-mode twin for scanning mmapped files without decoding them
+    _COMBINED_PATTERN_BYTES = re.compile(_COMBINED_PATTERN.pattern.encode(), re.IGNORECASE)
+    
+    # Same pattern set as a Hyperscan database, when the binding is installed
+    _HYPERSCAN = _compile_hyperscan(VULNERABLE_PATTERNS) if HYPERSCAN_AVAILABLE else None
+    # Scans release the GIL and a scratch space serves one scan at a time,
+    # so every scanning thread gets its own
+    _HYPERSCAN_SCRATCH = threading.local()
+    
     def __init__(self):
         self.findings = []
         self.risk_score = 0
+        self._summary_cache = None
+        self._summary_state = None
         
     def scan_directory(self, directory):
         """Scan directory for vulnerable crypto usage"""
@@ -47,87 +108,183 @@ class MigrationAssessment:
             print(f"❌ Directory not found: {directory}")
             return
         
-        # Get all relevant files
-        extensions = ['.py', '.java', '.js', '.cpp', '.c', '.h', '.go', '.rs', '.sh']
-        files = []
-        for ext in extensions:
-            files.extend(dir_path.rglob(f'*{ext}'))
+        # Get all relevant files: one tree walk, pruning vendored/build dirs
+        files = sorted(self._iter_source_files(dir_path))
         
         print(f"📁 Found {len(files)} files to scan\n")
         
         vulnerable_files = []
         
-        for file_path in files:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                file_findings = self._scan_content(content, str(file_path))
+        # Reads (and Hyperscan scans) release the GIL, so a thread pool
+        # overlaps disk latency across files; results are merged here in order
+        workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for file_path, file_findings in zip(files, executor.map(self._scan_file, files)):
                 if file_findings:
                     vulnerable_files.append({
                         'file': str(file_path),
                         'findings': file_findings
                     })
                     self.findings.extend(file_findings)
-                    
-            except Exception as e:
-                pass
+                    self.risk_score += self._risk_points(file_findings)
         
         return vulnerable_files
     
+    def _iter_source_files(self, root):
+        """Paths of scannable source files under root, skipping SKIP_DIRS"""
+        # Entry types come with the directory listing: no stat() per file
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in self.SKIP_DIRS:
+                        yield from self._iter_source_files(entry.path)
+                elif (entry.is_file(follow_symlinks=False)
+                        and os.path.splitext(entry.name)[1] in self.SCAN_EXTENSIONS):
+                    yield entry.path
+    
+    def _scan_file(self, file_path):
+        """Read and scan one file without touching shared state (thread worker)"""
+        try:
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return []  # mmap refuses empty files
+                # Scan the page cache directly: no str copy, no UTF-8 decode
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                    return self._find_vulnerabilities(content, str(file_path))
+        except (OSError, ValueError):
+            return []  # unreadable file; scan errors propagate
+    
+    @staticmethod
+    def _risk_points(findings):
+        """Risk score contribution of a list of findings"""
+        return sum(10 if finding['risk'] == 'HIGH' else 5 for finding in findings)
+    
     def _scan_content(self, content, filename):
         """Scan file content for vulnerable patterns"""
+        findings = self._find_vulnerabilities(content, filename)
+        self.risk_score += self._risk_points(findings)
+        return findings
+    
+    def _find_vulnerabilities(self, content, filename):
+        """Findings for one file's content (str, bytes or mmap)
+        
+        Pure, so safe to call from threads.
+        """
         findings = []
+        is_text = isinstance(content, str)
         
-        for crypto_type, patterns in self.VULNERABLE_PATTERNS.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, content, re.IGNORECASE)
-                for match in matches:
-                    # Find line number
-                    line_num = content[:match.start()].count('\n') + 1
-                    
-                    findings.append({
-                        'file': filename,
-                        'line': line_num,
-                        'type': crypto_type,
-                        'pattern': match.group(0),
-                        'risk': 'HIGH' if crypto_type in ['RSA', 'ECC'] else 'MEDIUM'
-                    })
-                    
-                    # Increase risk score
-                    self.risk_score += 10 if crypto_type in ['RSA', 'ECC'] else 5
+        if self._HYPERSCAN is not None:
+            if is_text:
+                content = content.encode('utf-8')
+                is_text = False
+            matches = self._hyperscan_matches(content)
+        else:
+            pattern = self._COMBINED_PATTERN if is_text else self._COMBINED_PATTERN_BYTES
+            group_types = self._GROUP_TYPES
+            matches = (
+                (match.start(), match.end(), group_types[match.lastgroup])
+                for match in pattern.finditer(content)
+            )
+        
+        # Matches arrive in file order, so count only the newlines since the
+        # previous match: one pass over the file in total
+        is_mmap = isinstance(content, mmap.mmap)
+        newline = '\n' if is_text else b'\n'
+        line_num = 1
+        counted_to = 0
+        
+        for start, end, crypto_type in matches:
+            # Find line number (mmap has no count(), so it pays for a gap copy)
+            if is_mmap:
+                line_num += content[counted_to:start].count(newline)
+            else:
+                line_num += content.count(newline, counted_to, start)
+            counted_to = start
+            
+            pattern = content[start:end]
+            if not is_text:
+                pattern = pattern.decode('utf-8', errors='ignore')
+            
+            findings.append({
+                'file': filename,
+                'line': line_num,
+                'type': crypto_type,
+                'pattern': pattern,
+                'risk': 'HIGH' if crypto_type in ['RSA', 'ECC'] else 'MEDIUM'
+            })
         
         return findings
     
+    def _hyperscan_matches(self, data):
+        """Scan bytes (or an mmap) with the Hyperscan database
+        
+        Returns:
+            [(start, end, crypto_type)] in file order, without overlaps
+            (the same matches re.finditer gives on the combined pattern)
+        """
+        db, types = self._HYPERSCAN
+        scratch = getattr(self._HYPERSCAN_SCRATCH, 'scratch', None)
+        if scratch is None:
+            scratch = self._HYPERSCAN_SCRATCH.scratch = hyperscan.Scratch(db)
+        hits = []
+        
+        def on_match(pattern_id, start, end, flags, context):
+            hits.append((start, pattern_id, end))
+        
+        db.scan(data, match_event_handler=on_match, scratch=scratch)
+        
+        # Hyperscan reports every match by end offset; keep the leftmost,
+        # first-listed pattern and drop anything overlapping it
+        matches = []
+        last_end = 0
+        for start, pattern_id, end in sorted(hits):
+            if start >= last_end:
+                matches.append((start, end, types[pattern_id]))
+                last_end = end
+        return matches
+    
     def generate_report(self, output_file=None):
         """Generate comprehensive migration report"""
+        summary = self._summary()
         report = {
-            'scan_date': datetime.now().isoformat(),
+            'scan_date': summary['scan_date'],
             'total_findings': len(self.findings),
             'risk_score': self.risk_score,
-            'risk_level': self._calculate_risk_level(),
-            'findings_by_type': self._group_findings(),
-            'migration_timeline': self._estimate_timeline(),
-            'recommendations': self._generate_recommendations(),
+            'risk_level': summary['risk_level'],
+            'findings_by_type': summary['findings_by_type'],
+            'migration_timeline': summary['migration_timeline'],
+            'recommendations': summary['recommendations'],
             'detailed_findings': self.findings[:50]  # Limit to 50 for readability
         }
         
         if output_file:
-            with open(output_file, 'w') as f:
-                json.dump(report, f, indent=2)
+            Path(output_file).write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
             print(f"\n📄 Report saved to: {output_file}")
         
         return report
     
+    def _summary(self):
+        """Risk level, grouped findings, timeline and recommendations
+        
+        Computed once per scan state and shared by generate_report and
+        print_summary; rebuilt only when findings or the risk score change.
+        """
+        state = (len(self.findings), self.risk_score)
+        if self._summary_state != state:
+            now = datetime.now()
+            self._summary_cache = {
+                'scan_date': now.isoformat(),
+                'risk_level': self._calculate_risk_level(),
+                'findings_by_type': self._group_findings(),
+                'migration_timeline': self._estimate_timeline(now),
+                'recommendations': self._generate_recommendations(),
+            }
+            self._summary_state = state
+        return self._summary_cache
+    
     def _group_findings(self):
         """Group findings by crypto type"""
-        groups = {}
-        for finding in self.findings:
-            crypto_type = finding['type']
-            if crypto_type not in groups:
-                groups[crypto_type] = 0
-            groups[crypto_type] += 1
-        return groups
+        return dict(Counter(finding['type'] for finding in self.findings))
     
     def _calculate_risk_level(self):
         """Calculate overall risk level"""
@@ -140,7 +297,7 @@ class MigrationAssessment:
         else:
             return 'LOW'
     
-    def _estimate_timeline(self):
+    def _estimate_timeline(self, now=None):
         """Estimate migration timeline"""
         num_findings = len(self.findings)
         
@@ -158,7 +315,7 @@ class MigrationAssessment:
                 'Phase 2 - Testing': f'{testing_weeks} weeks',
                 'Phase 3 - Deployment': f'{deployment_weeks} weeks'
             },
-            'estimated_completion': (datetime.now() + timedelta(weeks=total_weeks)).strftime('%Y-%m-%d')
+            'estimated_completion': ((now or datetime.now()) + timedelta(weeks=total_weeks)).strftime('%Y-%m-%d')
         }
     
     def _generate_recommendations(self):
@@ -204,21 +361,23 @@ class MigrationAssessment:
         print("📊 MIGRATION ASSESSMENT SUMMARY")
         print("="*70)
         
+        summary = self._summary()
+        
         print(f"\n🔍 Total Findings: {len(self.findings)}")
         print(f"⚠️  Risk Score: {self.risk_score}")
-        print(f"🚨 Risk Level: {self._calculate_risk_level()}")
+        print(f"🚨 Risk Level: {summary['risk_level']}")
         
         print(f"\n📈 Findings by Type:")
-        for crypto_type, count in self._group_findings().items():
+        for crypto_type, count in summary['findings_by_type'].items():
             print(f"   • {crypto_type}: {count}")
         
-        timeline = self._estimate_timeline()
+        timeline = summary['migration_timeline']
         print(f"\n⏱️  Estimated Migration Timeline: {timeline['total_weeks']} weeks")
         for phase, duration in timeline['phases'].items():
             print(f"   • {phase}: {duration}")
         
         print(f"\n🎯 Top Recommendations:")
-        for rec in self._generate_recommendations()[:3]:
+        for rec in summary['recommendations'][:3]:
             print(f"\n   [{rec['priority']}] {rec['action']}")
             print(f"   → {rec['description']}")
         
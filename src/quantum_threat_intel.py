@@ -5,9 +5,108 @@ Real-time assessment of quantum computing progress and threat timeline
 """
 
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import json
 import math
+import random
+from functools import lru_cache
+from types import MappingProxyType
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Data sensitivity multipliers; unknown levels count as 1.0 (CONFIDENTIAL)
+SENSITIVITY_MULTIPLIERS = {
+    'PUBLIC': 0.1,
+    'INTERNAL': 0.5,
+    'CONFIDENTIAL': 1.0,
+    'SECRET': 1.5,
+    'TOP_SECRET': 2.0
+}
+
+# Sorted key array + matching coefficients, for np.searchsorted lookups
+_SENSITIVITY_LEVELS = np.array(sorted(SENSITIVITY_MULTIPLIERS))
+_SENSITIVITY_FACTORS = np.array([SENSITIVITY_MULTIPLIERS[level] for level in _SENSITIVITY_LEVELS])
+
+def _sensitivity_factors(sensitivities):
+    """Multiplier for each sensitivity label (case-insensitive), as one array"""
+    labels = np.char.upper(np.asarray(sensitivities, dtype=str))
+    idx = np.searchsorted(_SENSITIVITY_LEVELS, labels).clip(max=len(_SENSITIVITY_LEVELS) - 1)
+    return np.where(_SENSITIVITY_LEVELS[idx] == labels, _SENSITIVITY_FACTORS[idx], 1.0)
+
+# Current state (2026)
+CURRENT_YEAR = 2026
+CURRENT_QUBITS = 1386  # IBM Flamingo
+
+# Growth model: qubit counts triple every 2 years (conservative), then error
+# correction needs a few more years to mature; estimates are +/- 2 years
+_YEARS_PER_LOG_GROWTH = 2.0 / math.log(3)
+_ERROR_CORRECTION_YEARS = 3
+_CONSERVATIVE_PAD = 2
+
+# Shor's algorithm requirements for breaking crypto (read-only, shared)
+BREAKING_REQUIREMENTS = MappingProxyType({
+    'RSA-1024': {'logical_qubits': 2048, 'error_rate': 0.001},
+    'RSA-2048': {'logical_qubits': 4096, 'error_rate': 0.0001},
+    'RSA-4096': {'logical_qubits': 8192, 'error_rate': 0.00001},
+    'ECC-256': {'logical_qubits': 2330, 'error_rate': 0.001},
+})
+
+def _threat_level(years_remaining):
+    """Calculate current threat level"""
+    if years_remaining <= 3:
+        return 'IMMINENT'
+    elif years_remaining <= 7:
+        return 'HIGH'
+    elif years_remaining <= 12:
+        return 'MEDIUM'
+    else:
+        return 'LOW'
+
+# The same requirements as columns, for computing every timeline at once
+_ALGORITHM_NAMES = tuple(BREAKING_REQUIREMENTS)
+_LOGICAL_QUBITS = np.array(
+    [BREAKING_REQUIREMENTS[name]['logical_qubits'] for name in _ALGORITHM_NAMES],
+    dtype=np.float64
+)
+
+@lru_cache(maxsize=None)
+def _breaking_timelines():
+    """Breaking timeline of every known algorithm; inputs are all fixed, so cached"""
+    
+    # Estimate growth rate (roughly 3x every 2 years - conservative)
+    years_needed = np.log(_LOGICAL_QUBITS / CURRENT_QUBITS) * _YEARS_PER_LOG_GROWTH
+    
+    # Add time for error correction maturity
+    breaking_years = CURRENT_YEAR + years_needed + _ERROR_CORRECTION_YEARS
+    
+    # Conservative estimate adds 2 more years
+    conservative_years = breaking_years + _CONSERVATIVE_PAD
+    
+    # Optimistic (for attackers) subtracts 2 years
+    optimistic_years = np.maximum(CURRENT_YEAR + 1, breaking_years - _CONSERVATIVE_PAD)
+    
+    progress = CURRENT_QUBITS / _LOGICAL_QUBITS * 100
+    
+    timelines = {}
+    for i, algorithm in enumerate(_ALGORITHM_NAMES):
+        years_remaining = int(breaking_years[i] - CURRENT_YEAR)
+        timelines[algorithm] = {
+            'algorithm': algorithm,
+            'current_year': CURRENT_YEAR,
+            'predicted_breaking_year': int(breaking_years[i]),
+            'conservative_estimate': int(conservative_years[i]),
+            'optimistic_estimate': int(optimistic_years[i]),
+            'years_remaining': years_remaining,
+            'threat_level': _threat_level(years_remaining),
+            'required_qubits': BREAKING_REQUIREMENTS[algorithm]['logical_qubits'],
+            'current_qubits': CURRENT_QUBITS,
+            'progress_percentage': float(progress[i])
+        }
+    return timelines
 
 class QuantumThreatIntelligence:
     """Track quantum computing progress and predict threats"""
@@ -23,68 +122,27 @@ class QuantumThreatIntelligence:
         }
         
         # Shor's algorithm requirements for breaking crypto
-        self.breaking_requirements = {
-            'RSA-1024': {'logical_qubits': 2048, 'error_rate': 0.001},
-            'RSA-2048': {'logical_qubits': 4096, 'error_rate': 0.0001},
-            'RSA-4096': {'logical_qubits': 8192, 'error_rate': 0.00001},
-            'ECC-256': {'logical_qubits': 2330, 'error_rate': 0.001},
-        }
+        self.breaking_requirements = BREAKING_REQUIREMENTS
     
     def predict_breaking_timeline(self, algorithm='RSA-2048'):
         """Predict when quantum computers will break specific algorithms"""
-        
-        requirements = self.breaking_requirements.get(algorithm)
-        if not requirements:
-            return None
-        
-        # Current state (2026)
-        current_year = 2026
-        current_qubits = 1386  # IBM Flamingo
-        target_qubits = requirements['logical_qubits']
-        
-        # Estimate growth rate (roughly 3x every 2 years - conservative)
-        years_needed = math.log(target_qubits / current_qubits) / math.log(3) * 2
-        
-        # Add time for error correction maturity
-        error_correction_years = 3
-        
-        breaking_year = current_year + years_needed + error_correction_years
-        
-        # Conservative estimate adds 2 more years
-        conservative_year = breaking_year + 2
-        
-        # Optimistic (for attackers) subtracts 2 years
-        optimistic_year = max(current_year + 1, breaking_year - 2)
-        
-        return {
-            'algorithm': algorithm,
-            'current_year': current_year,
-            'predicted_breaking_year': int(breaking_year),
-            'conservative_estimate': int(conservative_year),
-            'optimistic_estimate': int(optimistic_year),
-            'years_remaining': int(breaking_year - current_year),
-            'threat_level': self._calculate_threat_level(int(breaking_year - current_year)),
-            'required_qubits': target_qubits,
-            'current_qubits': current_qubits,
-            'progress_percentage': (current_qubits / target_qubits) * 100
-        }
+        timeline = _breaking_timelines().get(algorithm)
+        # Callers get their own copy of the cached result
+        return dict(timeline) if timeline else None
+    
+    def predict_breaking_timeline_all(self):
+        """Breaking timelines for every known algorithm, keyed by name"""
+        return {name: dict(timeline) for name, timeline in _breaking_timelines().items()}
     
     def _calculate_threat_level(self, years_remaining):
         """Calculate current threat level"""
-        if years_remaining <= 3:
-            return 'IMMINENT'
-        elif years_remaining <= 7:
-            return 'HIGH'
-        elif years_remaining <= 12:
-            return 'MEDIUM'
-        else:
-            return 'LOW'
+        return _threat_level(years_remaining)
     
     def assess_data_risk(self, encryption_date, data_sensitivity, algorithm='RSA-2048'):
         """Assess risk for specific encrypted data"""
         
-        timeline = self.predict_breaking_timeline(algorithm)
-        if not timeline:
+        batch = self.assess_data_risk_batch([encryption_date], [data_sensitivity], algorithm)
+        if batch is None:
             return None
         
         # Parse date
@@ -93,39 +151,61 @@ class QuantumThreatIntelligence:
         else:
             enc_date = encryption_date
         
-        breaking_date = datetime(timeline['predicted_breaking_year'], 1, 1)
+        risk_score = float(batch['risk_score'][0])
+        years_until_breaking = batch['years_until_vulnerable']
         
-        # Calculate exposure window
-        years_until_breaking = (breaking_date - datetime.now()).days / 365.25
-        
-        # Data sensitivity multiplier
-        sensitivity_multipliers = {
-            'PUBLIC': 0.1,
-            'INTERNAL': 0.5,
-            'CONFIDENTIAL': 1.0,
-            'SECRET': 1.5,
-            'TOP_SECRET': 2.0
+        return {
+            'encryption_date': enc_date.isoformat(),
+            'algorithm': algorithm,
+            'sensitivity': data_sensitivity,
+            'risk_score': round(risk_score, 1),
+            'years_until_vulnerable': round(years_until_breaking, 1),
+            'breaking_year': batch['breaking_year'],
+            'needs_immediate_action': bool(batch['needs_immediate_action'][0]),
+            'recommendation': self._generate_recommendation(risk_score, data_sensitivity, years_until_breaking),
+            'safe_until': batch['safe_until'] if years_until_breaking > 0 else 'ALREADY VULNERABLE'
         }
+    
+    def assess_data_risk_batch(self, encryption_dates, data_sensitivities, algorithm='RSA-2048'):
+        """
+        Assess risk for many records encrypted with one algorithm at once
+        Returns: dict of per-record arrays (encryption_date as datetime64[D],
+        risk_score, needs_immediate_action) plus the shared timeline values
+        """
         
-        sensitivity_factor = sensitivity_multipliers.get(data_sensitivity.upper(), 1.0)
+        timeline = self.predict_breaking_timeline(algorithm)
+        if not timeline:
+            return None
+        
+        # Parse dates (ISO strings are cut to their YYYY-MM-DD part)
+        enc_dates = np.asarray(encryption_dates)
+        if enc_dates.dtype.kind in 'US':
+            enc_dates = enc_dates.astype('U10')
+        enc_dates = enc_dates.astype('datetime64[D]')
+        
+        breaking_date = np.datetime64(f"{timeline['predicted_breaking_year']}-01-01", 'D')
+        
+        # Calculate exposure window (the same for every record), in whole days
+        days_until_breaking = int((breaking_date - np.datetime64(date.today(), 'D')).astype(np.int64))
+        years_until_breaking = days_until_breaking / 365.25
+        
+        sensitivity_factor = _sensitivity_factors(data_sensitivities)
         
         # Calculate risk score (0-100)
         base_risk = 100 - (years_until_breaking / 15 * 100)  # Normalized to 15 years
-        risk_score = min(100, max(0, base_risk * sensitivity_factor))
+        risk_score = np.clip(base_risk * sensitivity_factor, 0, 100)
         
         # Determine if data needs immediate protection
-        needs_immediate_action = risk_score > 70 or years_until_breaking < 5
+        needs_immediate_action = (risk_score > 70) | (years_until_breaking < 5)
         
         return {
-            'encryption_date': enc_date.isoformat(),
+            'encryption_date': enc_dates,
             'algorithm': algorithm,
-            'sensitivity': data_sensitivity,
-            'risk_score': round(risk_score, 1),
-            'years_until_vulnerable': round(years_until_breaking, 1),
-            'breaking_year': timeline['predicted_breaking_year'],
+            'risk_score': risk_score,
             'needs_immediate_action': needs_immediate_action,
-            'recommendation': self._generate_recommendation(risk_score, data_sensitivity, years_until_breaking),
-            'safe_until': breaking_date.isoformat() if years_until_breaking > 0 else 'ALREADY VULNERABLE'
+            'years_until_vulnerable': years_until_breaking,
+            'breaking_year': timeline['predicted_breaking_year'],
+            'safe_until': f"{breaking_date}T00:00:00"
         }
     
     def _generate_recommendation(self, risk_score, sensitivity, years_remaining):
@@ -146,11 +226,7 @@ class QuantumThreatIntelligence:
         current_year = 2026
         
         # Analyze all algorithms
-        algorithms = ['RSA-1024', 'RSA-2048', 'RSA-4096', 'ECC-256']
-        predictions = {}
-        
-        for algo in algorithms:
-            predictions[algo] = self.predict_breaking_timeline(algo)
+        predictions = self.predict_breaking_timeline_all()
         
         # Overall assessment
         earliest_break = min(p['predicted_breaking_year'] for p in predictions.values())
@@ -179,6 +255,137 @@ class QuantumThreatIntelligence:
             ]
         }
 
+# 2-3-5 wheel: after 2, 3 and 5, only residues coprime to 30 can be prime
+_WHEEL_PRIMES = (2, 3, 5)
+_WHEEL_OFFSETS = (7, 11, 13, 17, 19, 23, 29, 31)
+
+# Deterministic Miller-Rabin bases for every n < 3.3 * 10**24
+_MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+def _wheel_divisors():
+    """2, 3, 5, then every integer coprime to 30 (about 27% of candidates)"""
+    yield from _WHEEL_PRIMES
+    base = 0
+    while True:
+        for offset in _WHEEL_OFFSETS:
+            yield base + offset
+        base += 30
+
+def _is_probable_prime(n):
+    """Miller-Rabin primality test (deterministic in the range used here)"""
+    if n < 2:
+        return False
+    for p in _MILLER_RABIN_BASES:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in _MILLER_RABIN_BASES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+def _brent_rho(n, y, c):
+    """
+    One run of Brent's variant of Pollard's rho from seed y, constant c
+    Returns: (factor, iterations); factor == n means retry with new seeds
+    """
+    m = 128
+    g = r = q = 1
+    iterations = 0
+    while g == 1:
+        x = y
+        for _ in range(r):
+            y = (y * y + c) % n
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for _ in range(min(m, r - k)):
+                y = (y * y + c) % n
+                q = q * abs(x - y) % n
+            g = math.gcd(q, n)
+            k += m
+        iterations += r
+        r *= 2
+    if g == n:
+        # Batched gcd overshot; replay one step at a time
+        g = 1
+        while g == 1:
+            ys = (ys * ys + c) % n
+            g = math.gcd(abs(x - ys), n)
+    return g, iterations
+
+# The native rho squares in int64: below 2**31 directly, up to 2**50 with a
+# float-estimated quotient that is off by at most one; larger n stay in Python
+_NATIVE_RHO_LIMIT = 1 << 50
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _mulmod_native(a, b, n):
+        """a * b % n for 0 <= a, b < n < 2**50 without 128-bit integers"""
+        if n < 3037000499:  # a * b < 2**63
+            return a * b % n
+        quotient = np.int64(float(a) * float(b) / float(n))
+        remainder = a * b - quotient * n  # wraps, but the true value is small
+        while remainder < 0:
+            remainder += n
+        while remainder >= n:
+            remainder -= n
+        return remainder
+    
+    @njit(cache=True)
+    def _brent_rho_native(n, y, c):
+        """_brent_rho compiled to machine code, for n < _NATIVE_RHO_LIMIT"""
+        m = 128
+        g = 1
+        r = 1
+        q = 1
+        x = y
+        ys = y
+        iterations = 0
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (_mulmod_native(y, y, n) + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (_mulmod_native(y, y, n) + c) % n
+                    q = _mulmod_native(q, abs(x - y), n)
+                g = math.gcd(q, n)
+                k += m
+            iterations += r
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (_mulmod_native(ys, ys, n) + c) % n
+                g = math.gcd(abs(x - ys), n)
+        return g, iterations
+
+def _pollard_rho(n):
+    """
+    Pollard's rho (Brent) for an odd composite n, native when Numba is present
+    Returns: (nontrivial factor, iterations)
+    """
+    rho = _brent_rho_native if NUMBA_AVAILABLE and n < _NATIVE_RHO_LIMIT else _brent_rho
+    iterations = 0
+    while True:
+        factor, steps = rho(n, random.randrange(1, n), random.randrange(1, n))
+        iterations += steps
+        if factor != n:
+            return int(factor), int(iterations)
+
 class QuantumAttackSimulator:
     """Simulate Shor's algorithm attacking RSA"""
     
@@ -187,17 +394,22 @@ class QuantumAttackSimulator:
         self.factors = None
     
     def simulate_classical_factoring(self, n, max_attempts=1000000):
-        """Simulate classical factoring (very slow)"""
+        """Simulate classical factoring (trial division, then Pollard's rho)"""
         # For small numbers only (demo purposes)
-        if n > 10**12:
+        if n > 10**18:
             return {
                 'success': False,
                 'message': 'Number too large for classical factoring demo',
                 'estimated_time': 'Millions of years'
             }
         
+        # Trial division by 2, 3, 5 and numbers coprime to 30
+        root = math.isqrt(n)
+        limit = min(root, max_attempts - 1)
         attempts = 0
-        for i in range(2, min(int(n**0.5) + 1, max_attempts)):
+        for i in _wheel_divisors():
+            if i > limit:
+                break
             attempts += 1
             if n % i == 0:
                 return {
@@ -208,6 +420,18 @@ class QuantumAttackSimulator:
                     'method': 'Classical brute force'
                 }
         
+        # Trial division stopped early: unless n is prime, rho finds a
+        # factor in ~n**(1/4) steps
+        if limit < root and not _is_probable_prime(n):
+            factor, iterations = _pollard_rho(n)
+            return {
+                'success': True,
+                'factor1': min(factor, n // factor),
+                'factor2': max(factor, n // factor),
+                'attempts': attempts + iterations,
+                'method': "Classical Pollard's rho"
+            }
+        
         return {
             'success': False,
             'attempts': attempts,
@@ -222,7 +446,7 @@ class QuantumAttackSimulator:
         
         # Simulate quantum period finding
         factors = []
-        for i in range(2, min(int(n**0.5) + 1, 100000)):
+        for i in range(2, min(math.isqrt(n) + 1, 100000)):
             if n % i == 0:
                 factors = [i, n // i]
                 break
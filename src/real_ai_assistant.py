@@ -4,6 +4,8 @@ Real-Time AI Assistant using Groq LLM
 """
 
 import os
+import re
+from collections import deque
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +16,26 @@ try:
 except ImportError:
     GROQ_AVAILABLE = False
 
+# Tried in order; the first is the current working model
+_MODELS = ("llama-3.3-70b-versatile", "llama3-8b-8192", "mixtral-8x7b-32768")
+
+_KYBER_ANSWER = """Kyber-768 uses lattice-based cryptography. It creates a "noisy" lattice structure where:
+1. Key Generation: Creates random lattice points with noise
+2. Encryption: Hides messages by adding them to lattice points
+3. Decryption: Removes noise using secret knowledge
+
+Quantum computers can't efficiently solve the Shortest Vector Problem in high-dimensional lattices, making Kyber quantum-resistant."""
+
+_RSA_ANSWER = """RSA-2048 will likely be broken by quantum computers around 2029-2030. Current quantum computers have ~1,386 qubits; breaking RSA-2048 requires ~4,096 logical qubits. The "harvest now, decrypt later" threat means adversaries are already collecting encrypted data for future decryption."""
+
+_LIMITED_MODE_ANSWER = """I'm in limited mode. I can help with: Kyber-768 mechanics, RSA vulnerabilities, quantum timelines, migration strategies. Ask a specific question about these topics!"""
+
+# (pattern, answer) pairs checked in order; each needs both keywords, in either order
+_FALLBACK_PATTERNS = [
+    (re.compile(r'kyber.*work|work.*kyber', re.I | re.S), _KYBER_ANSWER),
+    (re.compile(r'rsa.*(?:break|when)|(?:break|when).*rsa', re.I | re.S), _RSA_ANSWER),
+]
+
 class RealTimeAIAssistant:
     """Real AI assistant powered by Groq LLM"""
     
@@ -22,17 +44,13 @@ class RealTimeAIAssistant:
             self.enabled = False
             return
             
-        self.api_key = (
-            api_key or 
-            os.environ.get('GROQ_API_KEY') or
-            os.getenv('GROQ_API_KEY')
-        )
+        self.api_key = api_key or os.environ.get('GROQ_API_KEY')
         
         if self.api_key:
             try:
                 self.client = Groq(api_key=self.api_key)
-                # Use the new working model
-                self.models = ["llama-3.3-70b-versatile", "llama3-8b-8192", "mixtral-8x7b-32768"]
+                self._create = self.client.chat.completions.create
+                self.models = _MODELS
                 self.model = self.models[0]
                 self.enabled = True
                 print(f"✅ Groq AI enabled with model: {self.model}")
@@ -45,8 +63,10 @@ class RealTimeAIAssistant:
         self.system_prompt = """You are QBits AI Assistant, an expert in post-quantum cryptography, 
 quantum computing, and cybersecurity. Provide clear, accurate, concise answers (2-4 paragraphs).
 Specialize in: CRYSTALS-Kyber, quantum threats, RSA vulnerabilities, NIST standards, and migration strategies."""
+        self._system_message = {"role": "system", "content": self.system_prompt}
 
-        self.conversation_history = []
+        # Only the last 10 messages are sent as context; older ones fall off
+        self.conversation_history = deque(maxlen=10)
     
     def ask(self, question):
         """Ask the AI a question"""
@@ -56,17 +76,17 @@ Specialize in: CRYSTALS-Kyber, quantum threats, RSA vulnerabilities, NIST standa
         
         last_error = None
         self.conversation_history.append({"role": "user", "content": question})
-        if len(self.conversation_history) > 10:
-            self.conversation_history = self.conversation_history[-10:]
 
-        for model in self.models:
+        messages = [self._system_message, *self.conversation_history]
+        
+        # Start from the model that last answered, so a dead model
+        # isn't retried on every question
+        start = self.models.index(self.model)
+        for model in self.models[start:] + self.models[:start]:
             try:
-                response = self.client.chat.completions.create(
+                response = self._create(
                     model=model,
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        *self.conversation_history
-                    ],
+                    messages=messages,
                     temperature=0.7,
                     max_tokens=600,
                     top_p=1
@@ -85,23 +105,14 @@ Specialize in: CRYSTALS-Kyber, quantum threats, RSA vulnerabilities, NIST standa
     
     def _fallback_response(self, question):
         """Fallback responses"""
-        q = question.lower()
-        
-        if 'kyber' in q and 'work' in q:
-            return """Kyber-768 uses lattice-based cryptography. It creates a "noisy" lattice structure where:
-1. Key Generation: Creates random lattice points with noise
-2. Encryption: Hides messages by adding them to lattice points
-3. Decryption: Removes noise using secret knowledge
-
-Quantum computers can't efficiently solve the Shortest Vector Problem in high-dimensional lattices, making Kyber quantum-resistant."""
-
-        elif 'rsa' in q and ('break' in q or 'when' in q):
-            return """RSA-2048 will likely be broken by quantum computers around 2029-2030. Current quantum computers have ~1,386 qubits; breaking RSA-2048 requires ~4,096 logical qubits. The "harvest now, decrypt later" threat means adversaries are already collecting encrypted data for future decryption."""
+        for pattern, answer in _FALLBACK_PATTERNS:
+            if pattern.search(question):
+                return answer
 
-        return """I'm in limited mode. I can help with: Kyber-768 mechanics, RSA vulnerabilities, quantum timelines, migration strategies. Ask a specific question about these topics!"""
+        return _LIMITED_MODE_ANSWER
     
     def clear_history(self):
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=10)
 
 if __name__ == "__main__":
     assistant = RealTimeAIAssistant()
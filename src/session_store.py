@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Session Store
+Keeps per-session keys and pending encrypted downloads with a TTL.
+Backed by Redis when available so several workers can share sessions.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from file_encryptor import FileEncryptor
+
+class SessionStore:
+    """Per-session encryptors and encrypted-file paths, expiring after ttl seconds"""
+
+    FILES_KEY = 'qbits:files'  # sorted set: temp file path -> expiry time
+
+    def __init__(self, redis_client=None, ttl=3600, cache_size=256):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        # session_id -> (encryptor, expires_at); the store itself without Redis,
+        # an LRU of rebuilt encryptors for hot sessions with Redis
+        self._encryptors = OrderedDict()
+        # session_id -> (file_path, original_filename, expires_at), no Redis only
+        self._files = {}
+
+    def _keys_key(self, session_id):
+        return f'sess:{session_id}:keys'
+
+    def _file_key(self, session_id):
+        return f'sess:{session_id}:file'
+
+    def _cache_encryptor(self, session_id, encryptor, expires_at):
+        with self._lock:
+            self._encryptors[session_id] = (encryptor, expires_at)
+            self._encryptors.move_to_end(session_id)
+            if self.redis is not None and len(self._encryptors) > self.cache_size:
+                self._encryptors.popitem(last=False)
+
+    def add_encryptor(self, session_id, encryptor):
+        """Register an encryptor (with keys) under session_id"""
+        if self.redis is not None:
+            self.redis.setex(self._keys_key(session_id), self.ttl, json.dumps(encryptor.keys))
+        self._cache_encryptor(session_id, encryptor, time.time() + self.ttl)
+
+    def get_encryptor(self, session_id):
+        """Return the session's encryptor, or None if unknown/expired"""
+        if not session_id:
+            return None
+
+        with self._lock:
+            entry = self._encryptors.get(session_id)
+            if entry is not None:
+                encryptor, expires_at = entry
+                if expires_at > time.time():
+                    self._encryptors.move_to_end(session_id)
+                    return encryptor
+                del self._encryptors[session_id]
+
+        if self.redis is None:
+            return None
+
+        # Another worker created this session: rebuild it from the stored keys
+        pipe = self.redis.pipeline()
+        pipe.get(self._keys_key(session_id))
+        pipe.ttl(self._keys_key(session_id))
+        raw, ttl = pipe.execute()
+        if raw is None:
+            return None
+
+        keys = json.loads(raw)
+        encryptor = FileEncryptor(keys['algorithm'])
+        encryptor.keys = keys
+        self._cache_encryptor(session_id, encryptor, time.time() + max(ttl, 0))
+        return encryptor
+
+    def add_encrypted_file(self, session_id, file_path, original_filename):
+        """Remember the encrypted temp file waiting to be downloaded"""
+        expires_at = time.time() + self.ttl
+
+        if self.redis is not None:
+            pipe = self.redis.pipeline()
+            pipe.setex(self._file_key(session_id), self.ttl, json.dumps([file_path, original_filename]))
+            pipe.zadd(self.FILES_KEY, {file_path: expires_at})
+            pipe.execute()
+            return
+
+        with self._lock:
+            previous = self._files.get(session_id)
+            self._files[session_id] = (file_path, original_filename, expires_at)
+        if previous and previous[0] != file_path:
+            _remove(previous[0])
+
+    def pop_encrypted_file(self, session_id):
+        """Remove and return (file_path, original_filename), or None"""
+        if not session_id:
+            return None
+
+        if self.redis is not None:
+            pipe = self.redis.pipeline()
+            pipe.get(self._file_key(session_id))
+            pipe.delete(self._file_key(session_id))
+            raw, _ = pipe.execute()
+            if raw is None:
+                return None
+            file_path, original_filename = json.loads(raw)
+            self.redis.zrem(self.FILES_KEY, file_path)
+            return file_path, original_filename
+
+        with self._lock:
+            entry = self._files.pop(session_id, None)
+        if entry is None:
+            return None
+        file_path, original_filename, expires_at = entry
+        if expires_at <= time.time():
+            _remove(file_path)
+            return None
+        return file_path, original_filename
+
+    def sweep(self):
+        """Drop expired sessions and delete encrypted files nobody downloaded"""
+        now = time.time()
+
+        with self._lock:
+            for session_id in [s for s, (_, exp) in self._encryptors.items() if exp <= now]:
+                del self._encryptors[session_id]
+            expired_files = [s for s, entry in self._files.items() if entry[2] <= now]
+            expired_paths = [self._files.pop(s)[0] for s in expired_files]
+
+        if self.redis is not None:
+            expired_paths = [p.decode('utf-8') if isinstance(p, bytes) else p
+                             for p in self.redis.zrangebyscore(self.FILES_KEY, 0, now)]
+            if expired_paths:
+                self.redis.zrem(self.FILES_KEY, *expired_paths)
+
+        for file_path in expired_paths:
+            _remove(file_path)
+
+        return len(expired_paths)
+
+    def start_sweeper(self, interval=300):
+        """Run sweep() every interval seconds on a daemon thread"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"⚠️  Session sweep failed: {e}")
+
+        threading.Thread(target=loop, daemon=True).start()
+
+def _remove(file_path):
+    try:
+        os.unlink(file_path)
+    except OSError:
+        pass
@@ -2,66 +2,82 @@
 """
 Basic Kyber-768 Test
 Tests key generation, encapsulation, and decapsulation
+Usage: test_kyber.py [iterations]
 """
 
 from oqs import KeyEncapsulation
+import statistics
 import time
 import sys
 
-def test_kyber():
+def _ms(samples_ns):
+    """(min, median) of nanosecond samples, in ms"""
+    return min(samples_ns) / 1e6, statistics.median(samples_ns) / 1e6
+
+def test_kyber(iterations=1):
     print("="*60)
     print("KYBER-768 BASIC TEST")
     print("="*60)
     
-    # Initialize Kyber-768
+    # Initialize Kyber-768 (one context reused for every iteration)
     print("\n[1] Initializing Kyber-768...")
     kem = KeyEncapsulation("Kyber768")
     print("✅ Kyber-768 initialized")
     
-    # Generate key pair
+    keygen_ns, encap_ns, decap_ns = [], [], []
+    
+    for i in range(iterations):
+        # Generate key pair
+        start = time.perf_counter_ns()
+        public_key = kem.generate_keypair()
+        keygen_ns.append(time.perf_counter_ns() - start)
+        
+        # Encapsulation (sender side)
+        start = time.perf_counter_ns()
+        ciphertext, shared_secret_sender = kem.encap_secret(public_key)
+        encap_ns.append(time.perf_counter_ns() - start)
+        
+        # Decapsulation (receiver side)
+        start = time.perf_counter_ns()
+        shared_secret_receiver = kem.decap_secret(ciphertext)
+        decap_ns.append(time.perf_counter_ns() - start)
+        
+        # Verify secrets match
+        if shared_secret_sender != shared_secret_receiver:
+            print(f"\n❌ FAILURE! Secrets don't match (iteration {i + 1})!")
+            sys.exit(1)
+    
+    keygen_time, keygen_median = _ms(keygen_ns)
+    encap_time, encap_median = _ms(encap_ns)
+    decap_time, decap_median = _ms(decap_ns)
+    
     print("\n[2] Generating key pair...")
-    start = time.time()
-    public_key = kem.generate_keypair()
-    keygen_time = (time.time() - start) * 1000
     print(f"✅ Key pair generated in {keygen_time:.3f}ms")
     print(f"   Public key size: {len(public_key)} bytes")
     print(f"   Secret key size: {len(kem.export_secret_key())} bytes")
     
-    # Encapsulation (sender side)
     print("\n[3] Encapsulating shared secret...")
-    start = time.time()
-    ciphertext, shared_secret_sender = kem.encap_secret(public_key)
-    encap_time = (time.time() - start) * 1000
     print(f"✅ Encapsulation completed in {encap_time:.3f}ms")
     print(f"   Ciphertext size: {len(ciphertext)} bytes")
     print(f"   Shared secret: {shared_secret_sender.hex()[:32]}...")
     
-    # Decapsulation (receiver side)
     print("\n[4] Decapsulating shared secret...")
-    start = time.time()
-    shared_secret_receiver = kem.decap_secret(ciphertext)
-    decap_time = (time.time() - start) * 1000
     print(f"✅ Decapsulation completed in {decap_time:.3f}ms")
     print(f"   Shared secret: {shared_secret_receiver.hex()[:32]}...")
     
-    # Verify secrets match
     print("\n[5] Verifying shared secrets match...")
-    if shared_secret_sender == shared_secret_receiver:
-        print("✅ SUCCESS! Shared secrets match!")
-        print(f"   Secret length: {len(shared_secret_sender)} bytes")
-    else:
-        print("❌ FAILURE! Secrets don't match!")
-        sys.exit(1)
+    print(f"✅ SUCCESS! Shared secrets match ({iterations} iteration(s))!")
+    print(f"   Secret length: {len(shared_secret_sender)} bytes")
     
-    # Summary
+    # Summary (best of N; median alongside when N > 1)
     print("\n" + "="*60)
     print("PERFORMANCE SUMMARY")
     print("="*60)
-    print(f"Key Generation:   {keygen_time:.3f}ms")
-    print(f"Encapsulation:    {encap_time:.3f}ms")
-    print(f"Decapsulation:    {decap_time:.3f}ms")
+    print(f"Key Generation:   {keygen_time:.3f}ms" + (f"  (median {keygen_median:.3f}ms)" if iterations > 1 else ""))
+    print(f"Encapsulation:    {encap_time:.3f}ms" + (f"  (median {encap_median:.3f}ms)" if iterations > 1 else ""))
+    print(f"Decapsulation:    {decap_time:.3f}ms" + (f"  (median {decap_median:.3f}ms)" if iterations > 1 else ""))
     print(f"Total:            {keygen_time + encap_time + decap_time:.3f}ms")
     print("="*60)
 
 if __name__ == "__main__":
-    test_kyber()
+    test_kyber(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
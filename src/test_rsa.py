@@ -18,12 +18,14 @@ def test_rsa():
     start = time.time()
     key = RSA.generate(2048)
     keygen_time = (time.time() - start) * 1000
+    public_key = key.publickey()
     print(f"✅ Key pair generated in {keygen_time:.3f}ms")
-    print(f"   Public key size: {len(key.publickey().export_key())} bytes")
+    print(f"   Public key size: {len(public_key.export_key())} bytes")
     print(f"   Private key size: {len(key.export_key())} bytes")
     
-    # Create cipher
-    cipher_rsa = PKCS1_OAEP.new(key.publickey())
+    # Create ciphers (one per direction, built once up front)
+    encrypt_cipher = PKCS1_OAEP.new(public_key)
+    decrypt_cipher = PKCS1_OAEP.new(key)
     
     # Generate random data to encrypt
     data = os.urandom(32)
@@ -32,16 +34,15 @@ def test_rsa():
     # Encrypt
     print("\n[3] Encrypting data...")
     start = time.time()
-    ciphertext = cipher_rsa.encrypt(data)
+    ciphertext = encrypt_cipher.encrypt(data)
     encrypt_time = (time.time() - start) * 1000
     print(f"✅ Encryption completed in {encrypt_time:.3f}ms")
     print(f"   Ciphertext size: {len(ciphertext)} bytes")
     
     # Decrypt
     print("\n[4] Decrypting data...")
-    cipher_rsa = PKCS1_OAEP.new(key)
     start = time.time()
-    decrypted = cipher_rsa.decrypt(ciphertext)
+    decrypted = decrypt_cipher.decrypt(ciphertext)
     decrypt_time = (time.time() - start) * 1000
     print(f"✅ Decryption completed in {decrypt_time:.3f}ms")
     
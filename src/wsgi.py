@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""
+WSGI entrypoint for gunicorn
+Run: gunicorn -c gunicorn_conf.py
+"""
+
+from app import app
+
+__all__ = ['app']